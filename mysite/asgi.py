@@ -2,6 +2,8 @@
 ASGI config for mysite project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+When POLLS_LIVE_RESULTS is on, requests for the live poll results are
+streamed by polls.live; all the others are handled by Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -9,8 +11,21 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from polls import live  # noqa: E402  (needs the apps to be loaded)
+
+
+async def application(scope, receive, send):
+    """Send live results requests to polls.live and the rest to Django."""
+    if settings.POLLS_LIVE_RESULTS and scope['type'] == 'http' and scope['method'] == 'GET':
+        match = live.LIVE_PATH.match(scope['path'])
+        if match:
+            await live.results_stream(scope, receive, send, int(match.group(1)))
+            return
+    await django_application(scope, receive, send)
@@ -0,0 +1,86 @@
+"""Send poll reads to read replicas and everything else to the primary.
+
+``settings.DATABASE_REPLICAS`` lists the aliases of the replicas.  Reads
+of the polls models go to one of them; writes, and reads of the other
+apps such as sessions and users, go to ``default``.  So do the reads
+made outside of a request, by the management commands and the vote
+buffer, which often write what they read.
+
+A replica may lag behind the primary, so once a request wrote to the
+polls tables its later reads use the primary, and the client gets a
+cookie that keeps its reads on the primary for
+``settings.DATABASE_REPLICA_PIN_SECONDS``.  A user redirected from the
+vote to the results page therefore always sees their own vote.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+
+from .middleware import HybridMiddleware
+
+PIN_COOKIE = 'db_pin'
+
+REPLICATED_APPS = {'polls'}
+
+_request = contextvars.ContextVar('db_request', default=None)
+
+
+class RequestState:
+    """Whether the current request reads from and wrote to the primary."""
+
+    def __init__(self, pinned=False):
+        """Start a request that wrote nothing yet."""
+        self.pinned = pinned
+        self.wrote = False
+
+
+class PrimaryReplicaRouter:
+    """Database router choosing between the primary and its replicas."""
+
+    def db_for_read(self, model, **hints):
+        """Read polls models from a replica unless the request is pinned."""
+        state = _request.get()
+        if (
+            settings.DATABASE_REPLICAS and state and not state.pinned
+            and model._meta.app_label in REPLICATED_APPS
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        """Write to the primary and pin the rest of the request to it."""
+        state = _request.get()
+        if state and model._meta.app_label in REPLICATED_APPS:
+            state.pinned = state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations across aliases, they hold the same data."""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Only migrate the primary, the replicas copy it."""
+        return db == 'default'
+
+
+class ReplicaPinningMiddleware(HybridMiddleware):
+    """Keep the reads of a client on the primary shortly after it wrote."""
+
+    def start(self, request):
+        """Pin the request if the client wrote recently."""
+        state = RequestState(pinned=PIN_COOKIE in request.COOKIES)
+        return state, _request.set(state)
+
+    def finish(self, request, response, state):
+        """Pin the next requests of the client if this one wrote."""
+        if state[0].wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
+
+    def end(self, state):
+        """Forget the state of the request."""
+        _request.reset(state[1])
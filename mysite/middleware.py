@@ -0,0 +1,254 @@
+"""Middleware to measure where the time of each request goes.
+
+Every middleware here works in both the sync and the async handler, so
+under ASGI the chain stays async down to the async views of polls.
+
+The queries of a request are recorded by an execute wrapper installed on
+every database connection, which adds them to the QueryStats of the
+requests in the current context.  The async views run in pool threads
+with a copy of that context, so their queries count as well.
+"""
+import abc
+import asyncio
+import contextvars
+import json
+import logging
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from polls.metrics import REQUEST_LATENCY, DB_QUERIES
+
+logger = logging.getLogger('mysite.timing')
+
+_query_stats = contextvars.ContextVar('query_stats', default=())
+
+
+class QueryStats:
+    """The queries of a request."""
+
+    def __init__(self):
+        """Start with no queries."""
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def add(self, sql, seconds):
+        """Record a query and its duration."""
+        self.seconds += seconds
+        self.count += 1
+        self.statements[sql] += 1
+
+    def repeated(self, threshold):
+        """Return the statements run at least threshold times."""
+        return {sql: count for sql, count in self.statements.items() if count >= threshold}
+
+
+def record_queries(execute, sql, params, many, context):
+    """Database execute wrapper adding the query to the stats of the context."""
+    stats = _query_stats.get()
+    if not stats:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - started
+        for request_stats in stats:
+            request_stats.add(sql, seconds)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Record the queries of every new connection."""
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+class HybridMiddleware:
+    """Base of the middleware that work in the sync and the async handler.
+
+    Subclasses implement start(), finish() and end(): start() is called
+    before the rest of the chain and returns the state of the request,
+    finish() is given the response, and end() runs even on errors.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Keep the next handler of the chain."""
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Let Django see that calling this middleware returns a
+            # coroutine, as django.utils.deprecation.MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        """Handle the request in the mode of the rest of the chain."""
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state = self.start(request)
+        try:
+            return self.finish(request, self.get_response(request), state)
+        finally:
+            self.end(state)
+
+    async def __acall__(self, request):
+        """Handle the request without leaving the event loop."""
+        state = self.start(request)
+        try:
+            return self.finish(request, await self.get_response(request), state)
+        finally:
+            self.end(state)
+
+    def start(self, request):
+        """Prepare the request and return its state."""
+        return None
+
+    def finish(self, request, response, state):
+        """Return the response of the request."""
+        return response
+
+    def end(self, state):
+        """Clean up after the request."""
+
+
+class QueryStatsMiddleware(HybridMiddleware, abc.ABC):
+    """Base of the middleware recording the queries of every request.
+
+    Subclasses implement report(), so one that does not fails when
+    Django loads the middleware rather than on the first request.
+    """
+
+    def start(self, request):
+        """Start recording the queries and the time of the request."""
+        for alias in connections:
+            # Connections opened before this module was imported.
+            install_query_recorder(None, connections[alias])
+        stats = QueryStats()
+        token = _query_stats.set(_query_stats.get() + (stats,))
+        return stats, token, time.perf_counter()
+
+    def finish(self, request, response, state):
+        """Report the queries and the time of the request."""
+        stats, token, started = state
+        self.report(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def end(self, state):
+        """Stop recording the queries."""
+        _query_stats.reset(state[1])
+
+    @abc.abstractmethod
+    def report(self, request, response, stats, total):
+        """Record the queries and the total seconds of a request."""
+
+
+class RequestTimingMiddleware(QueryStatsMiddleware):
+    """Report the SQL, template and total time of every request.
+
+    The times are sent in a ``Server-Timing`` header and logged as one
+    JSON line on the ``mysite.timing`` logger.  Requests slower than
+    ``settings.REQUEST_TIMING_SLOW_MS`` or that run the same SQL
+    ``settings.REQUEST_TIMING_REPEATED_QUERIES`` times or more, the usual
+    sign of an N+1 pattern, are logged as warnings.
+
+    Template time is measured for views that return a TemplateResponse,
+    which Django renders after the view returns.  The async views of
+    polls render in their pool thread and add the time to
+    ``request.template_seconds`` themselves.
+    """
+
+    def start(self, request):
+        """Start the clock of the request."""
+        request.template_seconds = 0.0
+        return super().start(request)
+
+    def process_template_response(self, request, response):
+        """Start the clock of the template rendering."""
+        if response.is_rendered:
+            return response
+        started = time.perf_counter()
+
+        def rendered(response):
+            request.template_seconds += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def report(self, request, response, stats, total):
+        """Add the Server-Timing header and log the request."""
+        if settings.REQUEST_TIMING_HEADER:
+            response['Server-Timing'] = (
+                f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries", '
+                f'tpl;dur={request.template_seconds * 1000:.1f}, '
+                f'total;dur={total * 1000:.1f}'
+            )
+        repeated = stats.repeated(settings.REQUEST_TIMING_REPEATED_QUERIES)
+        slow = total * 1000 >= settings.REQUEST_TIMING_SLOW_MS
+        match = getattr(request, 'resolver_match', None)
+        line = json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_ms': round(stats.seconds * 1000, 1),
+            'queries': stats.count,
+            'template_ms': round(request.template_seconds * 1000, 1),
+            'slow': slow,
+            'repeated_queries': repeated,
+        })
+        logger.log(logging.WARNING if slow or repeated else logging.INFO, line)
+
+
+class MetricsMiddleware(QueryStatsMiddleware):
+    """Record the latency and SQL queries of every request for Prometheus.
+
+    Requests are labelled with the name of the URL pattern they matched,
+    e.g. ``polls:results``, so every poll shares one time series.
+    """
+
+    def report(self, request, response, stats, total):
+        """Observe the latency and count the queries of the request."""
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        REQUEST_LATENCY.labels(view, request.method).observe(total)
+        DB_QUERIES.labels(view).inc(stats.count)
+
+
+class StaticFilesMiddleware(HybridMiddleware):
+    """Serve the static files with WhiteNoise in the sync and the async handler.
+
+    WhiteNoiseMiddleware only works in the sync handler, so under ASGI it
+    would turn the whole chain synchronous.
+    """
+
+    def __init__(self, get_response):
+        """Load the static files of WhiteNoise."""
+        super().__init__(get_response)
+        self.whitenoise = WhiteNoiseMiddleware(get_response)
+
+    def __call__(self, request):
+        """Serve a static file or pass the request on."""
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.whitenoise(request)
+
+    async def __acall__(self, request):
+        """Serve a static file or pass the request on, in the event loop."""
+        if self.whitenoise.autorefresh:
+            # Looks for the file on disk.
+            response = await sync_to_async(self.whitenoise.process_request)(request)
+        else:
+            response = self.whitenoise.process_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
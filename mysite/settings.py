@@ -14,6 +14,8 @@ from pathlib import Path
 import environ
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Initialise environment variables
 
 env = environ.Env()
@@ -48,7 +50,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'mysite.middleware.RequestTimingMiddleware',
+    'mysite.middleware.MetricsMiddleware',
+    'mysite.db_router.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'mysite.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -59,6 +65,15 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'mysite.urls'
 
+# Request timing: send a Server-Timing header, and log as warnings the
+# requests slower than REQUEST_TIMING_SLOW_MS or that run the same SQL
+# REQUEST_TIMING_REPEATED_QUERIES times or more.
+REQUEST_TIMING_HEADER = env.bool('REQUEST_TIMING_HEADER', default=True)
+
+REQUEST_TIMING_SLOW_MS = env.int('REQUEST_TIMING_SLOW_MS', default=500)
+
+REQUEST_TIMING_REPEATED_QUERIES = env.int('REQUEST_TIMING_REPEATED_QUERIES', default=5)
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -88,6 +103,111 @@ DATABASES = {
     }
 }
 
+# Read replicas of the primary, as a comma separated list of database
+# URLs, e.g. sqlite:////var/lib/ku-polls/replica.sqlite3.  The polls
+# pages read from them; see mysite/db_router.py.
+DATABASE_REPLICAS = []
+
+for number, url in enumerate(env.list('DATABASE_REPLICA_URLS', default=[])):
+    alias = f'replica{number}'
+    DATABASES[alias] = dict(env.db_url_config(url), TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['mysite.db_router.PrimaryReplicaRouter']
+
+# DATABASE_PROFILE=production keeps database connections open for
+# CONN_MAX_AGE seconds and sets SQLITE_PRODUCTION_PRAGMAS on every SQLite
+# connection: WAL journaling lets pages read while a vote is written and
+# busy_timeout makes writers wait for the lock instead of failing.
+DATABASE_PROFILE = env('DATABASE_PROFILE', default='development')
+
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': env.int('SQLITE_BUSY_TIMEOUT', default=5000),
+    'mmap_size': env.int('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024),
+    'cache_size': -env.int('SQLITE_CACHE_KB', default=64 * 1024),
+}
+
+if DATABASE_PROFILE == 'production':
+    SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+    for database in DATABASES.values():
+        database['CONN_MAX_AGE'] = env.int('CONN_MAX_AGE', default=600)
+elif DATABASE_PROFILE == 'development':
+    SQLITE_PRAGMAS = {}
+else:
+    raise ImproperlyConfigured(f'Unknown DATABASE_PROFILE {DATABASE_PROFILE!r}.')
+
+# Seconds the reads of a client stay on the primary after it wrote, longer
+# than the replication lag.
+DATABASE_REPLICA_PIN_SECONDS = env.int('DATABASE_REPLICA_PIN_SECONDS', default=30)
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# CACHE_URL selects the backend.  locmemcache:// is private to each
+# process, so it is only right for a single process: with several
+# workers a vote or an edit only invalidates the cache of the worker that
+# took it.  Use filecache:///var/tmp/ku-polls for several workers on one
+# node, or pymemcache://host:11211 for several nodes.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Cache alias and timeout (seconds) of the rendered poll results.  On a
+# per-process backend the results, their versions and the open questions
+# are only kept for a few seconds, so the other workers catch up quickly.
+POLLS_RESULTS_CACHE = env('POLLS_RESULTS_CACHE', default='default')
+
+POLLS_RESULTS_CACHE_TIMEOUT = env.int(
+    'POLLS_RESULTS_CACHE_TIMEOUT',
+    default=5 if CACHES.get(POLLS_RESULTS_CACHE, {}).get('BACKEND', '').endswith('LocMemCache')
+    else 24 * 60 * 60
+)
+
+
+# Number of questions on each page of the polls index.
+POLLS_INDEX_PAGE_SIZE = env.int('POLLS_INDEX_PAGE_SIZE', default=10)
+
+# Most questions returned by one request to the JSON API.
+POLLS_API_MAX_QUESTIONS = env.int('POLLS_API_MAX_QUESTIONS', default=100)
+
+# Most periods, e.g. minutes or hours, one request for the trend of a
+# question may cover.
+POLLS_TREND_MAX_POINTS = env.int('POLLS_TREND_MAX_POINTS', default=1440)
+
+
+# Voting
+# 'sync' writes every vote in its own transaction, 'buffered' collects
+# votes in memory and writes them in batches of POLLS_VOTE_BUFFER_SIZE
+# or every POLLS_VOTE_BUFFER_INTERVAL seconds.
+
+POLLS_VOTE_MODE = env('POLLS_VOTE_MODE', default='sync')
+
+POLLS_VOTE_BUFFER_SIZE = env.int('POLLS_VOTE_BUFFER_SIZE', default=500)
+
+POLLS_VOTE_BUFFER_INTERVAL = env.float('POLLS_VOTE_BUFFER_INTERVAL', default=1.0)
+
+# 'async' serves the detail, vote and results pages with async views
+# whose database work runs in a pool of POLLS_ASYNC_DB_WORKERS threads;
+# only useful under ASGI.
+POLLS_VIEW_MODE = env('POLLS_VIEW_MODE', default='sync')
+
+POLLS_ASYNC_DB_WORKERS = env.int('POLLS_ASYNC_DB_WORKERS', default=8)
+
+# Live results over Server-Sent Events, served by mysite.asgi only.
+# Feeds check for new votes every POLLS_LIVE_INTERVAL seconds and idle
+# streams get a comment every POLLS_LIVE_KEEPALIVE seconds.
+POLLS_LIVE_RESULTS = env.bool('POLLS_LIVE_RESULTS', default=False)
+
+POLLS_LIVE_INTERVAL = env.float('POLLS_LIVE_INTERVAL', default=1.0)
+
+POLLS_LIVE_KEEPALIVE = env.float('POLLS_LIVE_KEEPALIVE', default=15.0)
+
+# Number of rows fetched from the database at a time by the exports.
+POLLS_EXPORT_CHUNK_SIZE = env.int('POLLS_EXPORT_CHUNK_SIZE', default=2000)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -112,6 +232,46 @@ AUTHENTICATION_BACKENDS = (
    'django.contrib.auth.backends.ModelBackend',  
 )
 
+# Sessions and the logged in user.  AUTH_SESSION_MODE=database reads both
+# from the database on every request.  "cache" keeps the sessions in the
+# cache in front of the database and "cookie" in a signed cookie; both
+# also keep the user in the cache for AUTH_USER_CACHE_TIMEOUT seconds.
+AUTH_SESSION_MODE = env('AUTH_SESSION_MODE', default='database')
+
+SESSION_ENGINES = {
+    'database': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cached_db',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+if AUTH_SESSION_MODE not in SESSION_ENGINES:
+    raise ImproperlyConfigured(f'Unknown AUTH_SESSION_MODE {AUTH_SESSION_MODE!r}.')
+
+SESSION_ENGINE = SESSION_ENGINES[AUTH_SESSION_MODE]
+
+if AUTH_SESSION_MODE != 'database':
+    # ModelBackend stays listed so sessions started in database mode
+    # remain valid.
+    AUTHENTICATION_BACKENDS = ('polls.auth.CachedModelBackend',) + AUTHENTICATION_BACKENDS
+
+AUTH_USER_CACHE_TIMEOUT = env.int('AUTH_USER_CACHE_TIMEOUT', default=300)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Set to INFO to log every request with its timing.
+        'mysite.timing': {
+            'handlers': ['console'],
+            'level': env('REQUEST_TIMING_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 LOGIN_REDIRECT_URL = '/polls/'
 
 LOGOUT_REDIRECT_URL = '/polls/'
@@ -135,6 +295,12 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+STATIC_ROOT = env('STATIC_ROOT', default=str(BASE_DIR / 'staticfiles'))
+
+# collectstatic hashes the file names and writes gzip and brotli copies;
+# WhiteNoise serves the hashed files with far-future immutable headers.
+STATICFILES_STORAGE = 'mysite.storage.StaticFilesStorage'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
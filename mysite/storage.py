@@ -0,0 +1,19 @@
+"""Storage of the static files."""
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """Hashed, gzip and brotli compressed static files.
+
+    ``collectstatic`` gives every file a name containing the hash of its
+    content, rewrites the references between CSS files and writes the
+    compressed variants, so the files can be cached forever.  Until it
+    has run, e.g. in the tests, the files are served under their plain
+    names instead of failing on the missing manifest.
+    """
+
+    def stored_name(self, name):
+        """Return the hashed name of a file, or its name without a manifest."""
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
@@ -1,18 +1,32 @@
+import os
+
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import render, redirect
-from django.contrib.auth  import login, authenticate
+from django.contrib.auth  import login
 from django.contrib.auth.forms import UserCreationForm
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+)
 
 def signup(request):
     """Register a new user."""
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
         if form.is_valid():
-            form.save()
-            username = form.cleaned_data.get('username')
-            raw_passwd = form.cleaned_data.get('password')
-            user = authenticate(username=username,password=raw_passwd)
-            login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+            user = form.save()
+            login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
         return redirect('polls:index')
     else:
         form = UserCreationForm()
-    return render(request, 'registration/signup.html', {'form': form})
\ No newline at end of file
+    return render(request, 'registration/signup.html', {'form': form})
+
+
+def metrics(request):
+    """Expose the Prometheus metrics in the text format."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
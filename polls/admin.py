@@ -1,7 +1,33 @@
 """The admin models for polls application."""
-from django.contrib import admin
+import datetime
 
-from .models import Question, Choice
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.paginator import Paginator
+from django.db.models import BooleanField, Count, ExpressionWrapper, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from . import bulk, tallies
+from .models import Question, Choice, shard_sum
+
+
+class CappedCountPaginator(Paginator):
+    """Paginator that stops counting the rows after a cap.
+
+    Counting every row of a large table is a full scan.  This counts at
+    most ``cap`` rows, so the changelist shows the pages of the first
+    ``cap`` matches; searching or filtering narrows it down further.
+    """
+
+    cap = 10000
+
+    @cached_property
+    def count(self):
+        """Return the number of rows, at most cap."""
+        return self.object_list.order_by().values('pk')[:self.cap].count()
 
 
 class ChoiceInline(admin.TabularInline):
@@ -12,10 +38,16 @@ class ChoiceInline(admin.TabularInline):
 
 
 class QuestionAdmin(admin.ModelAdmin):
-    """The question of admin models."""
+    """The question of admin models.
+
+    The changelist reads every row with one query: the number of
+    choices comes from a subquery, the total votes from the stored
+    tally plus a subquery over its counter shards, and the state of the
+    poll is computed by the database against a single clock reading.
+    """
 
     fieldsets = [
-        (None, {'fields': ['question_text']}),
+        (None, {'fields': ['question_text', 'counter_shards']}),
         (
             'Date Information',
             {'fields': ['pub_date', 'end_date'], 'classes': ['collapse']}
@@ -27,10 +59,107 @@ class QuestionAdmin(admin.ModelAdmin):
         'pub_date',
         'was_published_recently',
         'is_published',
-        'can_vote'
+        'can_vote',
+        'choice_total',
+        'total_votes',
     )
     list_filter = ['pub_date']
-    search_fields = ['question_text']
+    # A prefix search uses the question_text_prefix_idx index, a search
+    # anywhere in the text reads the whole table.
+    search_fields = ['^question_text']
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+    actions = ['close_polls', 'reopen_polls', 'reset_votes', 'clone_questions']
+
+    def get_queryset(self, request):
+        """Annotate the questions with their choice total and state."""
+        now = timezone.now()
+        choices = (
+            Choice.objects.filter(question=OuterRef('pk')).order_by()
+            .values('question').annotate(total=Count('pk')).values('total')
+        )
+        return super().get_queryset(request).annotate(
+            choice_total=Coalesce(Subquery(choices), 0),
+            total_votes=F('vote_count') + shard_sum('question'),
+            published_recently=ExpressionWrapper(
+                Q(pub_date__gte=now - datetime.timedelta(days=1), pub_date__lte=now),
+                output_field=BooleanField()
+            ),
+            published=ExpressionWrapper(Q(pub_date__lte=now), output_field=BooleanField()),
+            open=ExpressionWrapper(
+                Q(pub_date__lte=now, end_date__gte=now), output_field=BooleanField()
+            ),
+        )
+
+    def save_model(self, request, obj, form, change):
+        """Save the question, folding its counter shards if their number changed."""
+        super().save_model(request, obj, form, change)
+        if change and 'counter_shards' in form.changed_data:
+            tallies.fold_shards([obj.pk])
+
+    @admin.display(boolean=True, ordering='pub_date', description='Published recently ?')
+    def was_published_recently(self, question):
+        """Return whether the question was published in the last day."""
+        return question.published_recently
+
+    @admin.display(boolean=True, ordering='published', description='Is published')
+    def is_published(self, question):
+        """Return whether the question is published."""
+        return question.published
+
+    @admin.display(boolean=True, ordering='open', description='Can vote')
+    def can_vote(self, question):
+        """Return whether the question is open for voting."""
+        return question.open
+
+    @admin.display(ordering='choice_total', description='Choices')
+    def choice_total(self, question):
+        """Return the number of choices of the question."""
+        return question.choice_total
+
+    @admin.display(ordering='total_votes', description='Total votes')
+    def total_votes(self, question):
+        """Return the votes of the question, its tally plus its shards."""
+        return question.total_votes
+
+    @admin.action(description='Close selected polls now')
+    def close_polls(self, request, queryset):
+        """End the voting of the selected questions with one update."""
+        closed = bulk.close_questions(queryset)
+        self.message_user(request, f'Closed {closed} polls.', messages.SUCCESS)
+
+    @admin.action(description=f'Reopen selected polls for {bulk.REOPEN_DAYS} days')
+    def reopen_polls(self, request, queryset):
+        """Let the selected questions take votes again with one update."""
+        reopened = bulk.reopen_questions(queryset)
+        self.message_user(request, f'Reopened {reopened} polls.', messages.SUCCESS)
+
+    @admin.action(description='Delete the votes of selected polls')
+    def reset_votes(self, request, queryset):
+        """Delete the votes of the selected questions and zero their tallies.
+
+        Like delete_selected, the first request only asks for a
+        confirmation; the votes are deleted when it is posted back.
+        """
+        if request.POST.get('post'):
+            deleted = tallies.reset_votes(queryset)
+            self.message_user(request, f'Deleted {deleted} votes.', messages.SUCCESS)
+            return None
+        questions = list(queryset)
+        return TemplateResponse(request, 'admin/polls/question/reset_votes_confirmation.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Are you sure?',
+            'opts': self.model._meta,
+            'questions': questions,
+            'total_votes': sum(question.total_votes for question in questions),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
+
+    @admin.action(description='Clone selected questions with their choices')
+    def clone_questions(self, request, queryset):
+        """Copy the selected questions and their choices with bulk inserts."""
+        copies = bulk.clone_questions(queryset, suffix=' (copy)')
+        self.message_user(request, f'Cloned {len(copies)} questions.', messages.SUCCESS)
 
 
 admin.site.register(Question, QuestionAdmin)
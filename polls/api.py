@@ -0,0 +1,180 @@
+"""Read-only JSON API returning many polls with their results at once.
+
+``GET /polls/api/questions?ids=1,2,3`` returns the given questions and
+``GET /polls/api/questions?state=open`` (or ``closed``, or no state for
+all of them) the latest published questions, with a cursor to the next
+ones.  Every question comes with its choices, their votes and the choice
+of the caller, read with three queries however many questions are
+returned, so a dashboard needs one request instead of one per poll.
+
+``GET /polls/api/questions/<id>/trend?resolution=hour`` (or ``minute``
+or ``day``) returns how the votes of a question moved over time, between
+the optional ``since`` and ``until`` ISO 8601 times.
+"""
+from django.conf import settings
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_GET
+from django.views.decorators.vary import vary_on_cookie
+
+from .models import Question, Choice, Vote
+from . import trends
+from .tallies import percentage
+from .views import encode_cursor, decode_cursor
+
+STATES = ['open', 'closed']
+
+
+def _error(message, status=400):
+    """Return a JSON response for a request that cannot be answered."""
+    return JsonResponse({'error': message}, status=status)
+
+
+def parse_time(value):
+    """Return the aware datetime of an ISO 8601 time, in the current zone if naive.
+
+    Raises:
+        ValueError: if the value is not a time
+    """
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(value)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_ids(value):
+    """Return the question ids of a comma separated list.
+
+    Raises:
+        ValueError: if a part of the list is not a number
+    """
+    return [int(part) for part in value.split(',') if part.strip()]
+
+
+def serialize(questions, user):
+    """Return the questions with their choices, results and the user's vote.
+
+    Args:
+        questions: list of Question
+        user: the caller; anonymous users have no vote
+
+    Returns:
+        list: one dict per question, in the order of questions
+    """
+    ids = [question.pk for question in questions]
+    choices = {}
+    for choice in Choice.objects.filter(question_id__in=ids).order_by('pk').values(
+        'id', 'question_id', 'choice_text', 'vote_count', 'shard_votes'
+    ):
+        choice['votes'] = choice['vote_count'] + choice['shard_votes']
+        choices.setdefault(choice['question_id'], []).append(choice)
+    own_votes = {}
+    if user.is_authenticated:
+        own_votes = dict(
+            Vote.objects.filter(user=user, question_id__in=ids).values_list('question_id', 'choice_id')
+        )
+    now = timezone.now()
+    data = []
+    for question in questions:
+        question_choices = choices.get(question.pk, [])
+        total = sum(choice['votes'] for choice in question_choices)
+        data.append({
+            'id': question.pk,
+            'question_text': question.question_text,
+            'pub_date': question.pub_date,
+            'end_date': question.end_date,
+            'can_vote': question.pub_date <= now <= question.end_date,
+            'choices': [
+                {
+                    'id': choice['id'],
+                    'choice_text': choice['choice_text'],
+                    'votes': choice['votes'],
+                    'percentage': percentage(choice['votes'], total),
+                }
+                for choice in question_choices
+            ],
+            'total': total,
+            'user_choice': own_votes.get(question.pk),
+        })
+    return data
+
+
+@require_GET
+@cache_control(private=True, no_cache=True)
+@vary_on_cookie
+def questions(request):
+    """Return many published questions with their results as JSON."""
+    limit = settings.POLLS_API_MAX_QUESTIONS
+    now = timezone.now()
+    published = Question.objects.filter(pub_date__lte=now).only(
+        'question_text', 'pub_date', 'end_date'
+    )
+    next_cursor = None
+    if 'ids' in request.GET:
+        try:
+            ids = parse_ids(request.GET['ids'])
+        except ValueError:
+            return _error('ids must be a comma separated list of question ids.')
+        if len(ids) > limit:
+            return _error(f'At most {limit} questions can be asked for at once.')
+        found = {question.pk: question for question in published.filter(pk__in=ids)}
+        page = [found[pk] for pk in dict.fromkeys(ids) if pk in found]
+    else:
+        state = request.GET.get('state')
+        if state == 'open':
+            published = published.open(now)
+        elif state == 'closed':
+            published = published.closed(now)
+        elif state is not None:
+            return _error(f"state must be one of {', '.join(STATES)}.")
+        cursor = request.GET.get('cursor')
+        if cursor:
+            try:
+                pub_date, pk = decode_cursor(cursor)
+            except ValueError:
+                return _error('Invalid cursor.')
+            published = published.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+            )
+        page = list(published.order_by('-pub_date', '-pk')[:limit + 1])
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor(page[-1])
+    return JsonResponse({
+        'questions': serialize(page, request.user),
+        'next_cursor': next_cursor,
+    })
+
+
+@require_GET
+@cache_control(no_cache=True)
+def trend(request, question_id):
+    """Return the votes of a published question over time as JSON."""
+    resolution = request.GET.get('resolution', 'hour')
+    if resolution not in trends.RESOLUTIONS:
+        return _error(f"resolution must be one of {', '.join(trends.RESOLUTIONS)}.")
+    now = timezone.now()
+    try:
+        question = Question.objects.only('question_text').get(pk=question_id, pub_date__lte=now)
+    except Question.DoesNotExist:
+        return _error('No question found matching the query.', status=404)
+    try:
+        until = parse_time(request.GET['until']) if 'until' in request.GET else now
+        if 'since' in request.GET:
+            since = parse_time(request.GET['since'])
+        else:
+            since = until - trends.DEFAULT_WINDOWS[resolution]
+    except ValueError:
+        return _error('since and until must be ISO 8601 times.')
+    since = trends.align(since, resolution)
+    if since >= until:
+        return _error('since must be before until.')
+    limit = settings.POLLS_TREND_MAX_POINTS
+    if (until - since) / trends.RESOLUTIONS[resolution] > limit:
+        return _error(f'At most {limit} periods can be asked for at once.')
+    return JsonResponse(trends.question_trend(question, resolution, since, until))
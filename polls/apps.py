@@ -7,3 +7,7 @@ class PollsConfig(AppConfig):
 
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'polls'
+
+    def ready(self):
+        """Connect the signal receivers of the application."""
+        from . import auth, results_cache, sqlite  # noqa: F401
@@ -0,0 +1,73 @@
+"""Async versions of the detail, vote and results views.
+
+Under ASGI a synchronous view holds one of the server's threads for the
+whole request.  These views keep the event loop free instead: the ORM
+work and the template rendering of the synchronous views run in a pool
+of ``settings.POLLS_ASYNC_DB_WORKERS`` threads, which also bounds the
+number of database connections.  ``settings.POLLS_VIEW_MODE = 'async'``
+routes the polls URLs to them.
+
+The views run in a copy of the context of the request, so the replica
+pinning of mysite/db_router.py and the query stats of mysite/middleware.py
+reach the pool threads.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import views
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the thread pool running the database work."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POLLS_ASYNC_DB_WORKERS,
+                thread_name_prefix='polls-db'
+            )
+    return _executor
+
+
+def _run_view(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            started = time.perf_counter()
+            response.render()
+            if hasattr(request, 'template_seconds'):
+                request.template_seconds += time.perf_counter() - started
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """Return an async view running the synchronous view in the pool."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            get_executor(),
+            functools.partial(context.run, _run_view, view, request, *args, **kwargs)
+        )
+    return wrapper
+
+
+detail = async_view(views.detail)
+
+vote = async_view(views.vote)
+
+results = async_view(views.ResultsView.as_view())
@@ -0,0 +1,52 @@
+"""Authentication backend that keeps the logged in users in the cache.
+
+Without it every request of a logged in user selects the user row
+before any poll query runs.  The cached user is dropped when the user
+is saved, e.g. after a password change or a login, deleted or logs
+out, and otherwise expires after ``settings.AUTH_USER_CACHE_TIMEOUT``
+seconds.  With several processes the cache must be shared, see
+CACHE_URL, for a change to reach all of them.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+
+def _user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend reading the user of a session from the cache."""
+
+    def get_user(self, user_id):
+        """Return the active user with this id, from the cache when possible."""
+        key = _user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+
+def forget_user(user_id):
+    """Drop the cached copy of a user."""
+    cache.delete(_user_key(user_id))
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_user(sender, instance, **kwargs):
+    """Forget a user that was edited or deleted."""
+    forget_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_logged_out(sender, request, user, **kwargs):
+    """Forget a user who logged out."""
+    if user is not None:
+        forget_user(user.pk)
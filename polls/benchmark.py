@@ -0,0 +1,426 @@
+"""Load benchmark of the polls pages.
+
+The benchmark works on a throwaway copy of the database: it seeds the
+requested number of questions, choices, users and votes, then sends
+requests to each endpoint from a pool of threads (WSGI) or from
+coroutines on one event loop (ASGI) and measures the throughput, the
+latency percentiles and the SQL queries per request.
+
+The contention benchmark sends concurrent votes to a database set up
+once as in development and once with the production profile, see
+DATABASE_PROFILE in the settings.  The counter benchmark sends them to
+a single poll whose tallies are kept once in single rows and once in
+counter shards, see polls.tallies.
+"""
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import tallies
+from .models import Question, Choice, Vote
+
+ENDPOINTS = ['index', 'detail', 'vote', 'results']
+
+PROFILES = ['development', 'production']
+
+LAYOUTS = ['single', 'sharded']
+
+
+class BenchmarkDatabase:
+    """Context manager that swaps the default database for an empty copy.
+
+    SQLite databases are created in a temporary file rather than in
+    memory so that every thread of the benchmark shares them.  Django
+    never closes a connection to an in-memory SQLite database, such as
+    the one of the test suite, so it is set aside meanwhile.
+    """
+
+    def __enter__(self):
+        """Create and migrate the throwaway database."""
+        self._old_name = connection.settings_dict['NAME']
+        self._old_test_name = connection.settings_dict['TEST']['NAME']
+        self._memory_connection = None
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self._memory_connection, connection.connection = connection.connection, None
+        if connection.vendor == 'sqlite':
+            handle, path = tempfile.mkstemp(prefix='polls-benchmark-', suffix='.sqlite3')
+            os.close(handle)
+            connection.settings_dict['TEST']['NAME'] = path
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        return self
+
+    def __exit__(self, *exc_info):
+        """Drop the throwaway database."""
+        connections.close_all()
+        connection.creation.destroy_test_db(self._old_name, verbosity=0)
+        connection.settings_dict['TEST']['NAME'] = self._old_test_name
+        if self._memory_connection is not None:
+            connection.connection = self._memory_connection
+
+
+def seed(questions, choices, users, votes, rng):
+    """Fill the database with open questions, users and votes.
+
+    Args:
+        questions: number of questions
+        choices: number of choices per question
+        users: number of users
+        votes: number of votes, at most questions * users
+        rng: random.Random used to pick the votes
+    """
+    now = timezone.now()
+    Question.objects.bulk_create(
+        Question(
+            question_text=f'Benchmark question {i}',
+            pub_date=now - timedelta(days=1, minutes=i),
+            end_date=now + timedelta(days=30)
+        )
+        for i in range(questions)
+    )
+    question_ids = list(Question.objects.values_list('pk', flat=True))
+    Choice.objects.bulk_create(
+        Choice(question_id=question_id, choice_text=f'Choice {i}')
+        for question_id in question_ids for i in range(choices)
+    )
+    password = make_password('benchmark')
+    User.objects.bulk_create(
+        User(username=f'benchmark{i}', password=password) for i in range(users)
+    )
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    choice_ids = {}
+    for pk, question_id in Choice.objects.values_list('pk', 'question_id'):
+        choice_ids.setdefault(question_id, []).append(pk)
+    pairs = rng.sample(range(len(question_ids) * len(user_ids)), min(votes, len(question_ids) * len(user_ids)))
+    Vote.objects.bulk_create((
+        Vote(
+            question_id=question_ids[pair // len(user_ids)],
+            user_id=user_ids[pair % len(user_ids)],
+            choice_id=rng.choice(choice_ids[question_ids[pair // len(user_ids)]])
+        )
+        for pair in pairs
+    ), batch_size=500)
+    tallies.rebuild_tallies()
+    return question_ids, choice_ids, user_ids
+
+
+def percentile(values, percent):
+    """Return the given percentile of the values, interpolating linearly."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(latencies, queries, errors, elapsed):
+    """Return the statistics of one endpoint.
+
+    Args:
+        latencies: seconds taken by each request
+        queries: number of SQL queries of each request
+        errors: number of requests that failed
+        elapsed: wall clock seconds for all requests
+    """
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'latency_ms': {
+            'mean': statistics.mean(latencies) * 1000 if latencies else 0.0,
+            'p50': percentile(latencies, 50) * 1000,
+            'p95': percentile(latencies, 95) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+        },
+        'queries_per_request': statistics.mean(queries) if queries else 0.0,
+    }
+
+
+class WSGIDriver:
+    """Send the requests of an endpoint through Django's WSGI handler."""
+
+    def __init__(self, question_ids, choice_ids, user_ids, rng):
+        """Keep the seeded ids to pick request targets from."""
+        self.question_ids = question_ids
+        self.choice_ids = choice_ids
+        self.user_ids = user_ids
+        self.rng = rng
+        self._local = threading.local()
+
+    def login(self, client):
+        """Log the client in as a random seeded user and return it."""
+        client.force_login(User.objects.get(pk=self.rng.choice(self.user_ids)))
+        return client
+
+    def client(self):
+        """Return the logged in client of the current thread."""
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.login(Client(raise_request_exception=False))
+        return self._local.client
+
+    def target(self, endpoint):
+        """Return the method, path and form data of a request to the endpoint."""
+        question_id = self.rng.choice(self.question_ids)
+        if endpoint == 'index':
+            return 'get', reverse('polls:index'), None
+        if endpoint == 'detail':
+            return 'get', reverse('polls:detail', args=(question_id,)), None
+        if endpoint == 'vote':
+            choice_id = self.rng.choice(self.choice_ids[question_id])
+            return 'post', reverse('polls:vote', args=(question_id,)), f'choice={choice_id}'
+        return 'get', reverse('polls:results', args=(question_id,)), None
+
+    def request(self, endpoint):
+        """Send one request and return (seconds, queries, ok)."""
+        client = self.client()
+        method, path, data = self.target(endpoint)
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            if method == 'post':
+                response = client.post(path, data, content_type=FORM)
+            else:
+                response = client.get(path)
+            seconds = time.perf_counter() - started
+        return seconds, counter.count, response.status_code < 400
+
+    def close(self):
+        """Close the database connection of the current thread."""
+        connections.close_all()
+
+
+class ASGIDriver(WSGIDriver):
+    """Send the requests of an endpoint through Django's ASGI handler.
+
+    Requests run as coroutines on one event loop, so the views decide
+    which threads the work runs on, as they would under an ASGI server.
+    """
+
+    async def request(self, client, endpoint):
+        """Send one request and return (seconds, ok)."""
+        method, path, data = self.target(endpoint)
+        started = time.perf_counter()
+        if method == 'post':
+            response = await client.post(path, data, content_type=FORM)
+        else:
+            response = await client.get(path)
+        return time.perf_counter() - started, response.status_code < 400
+
+
+FORM = 'application/x-www-form-urlencoded'
+
+
+class QueryCounter:
+    """Database execute wrapper that counts the queries."""
+
+    def __init__(self):
+        """Start counting from zero."""
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Count the query and run it."""
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def watch_all(self):
+        """Count the queries of every connection, in any thread."""
+        def install(sender, connection, **kwargs):
+            if self not in connection.execute_wrappers:
+                connection.execute_wrappers.append(self)
+
+        self._install = install
+        connection_created.connect(install)
+        for alias in connections:
+            install(None, connections[alias])
+
+    def unwatch_all(self):
+        """Stop counting the queries of new connections."""
+        connection_created.disconnect(self._install)
+        connections.close_all()
+
+
+def run_endpoint(driver, endpoint, requests, concurrency):
+    """Send requests to an endpoint from concurrency threads.
+
+    Returns:
+        dict: the statistics of the endpoint, see summarize()
+    """
+    def work(_):
+        return driver.request(endpoint)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Warm up every thread so logging in is not measured.
+        list(pool.map(lambda _: driver.client(), range(concurrency)))
+        started = time.perf_counter()
+        results = list(pool.map(work, range(requests)))
+        elapsed = time.perf_counter() - started
+        list(pool.map(lambda _: driver.close(), range(concurrency)))
+    return summarize(
+        [seconds for seconds, queries, ok in results],
+        [queries for seconds, queries, ok in results],
+        sum(1 for seconds, queries, ok in results if not ok),
+        elapsed
+    )
+
+
+def run_endpoint_asgi(driver, endpoint, requests, concurrency):
+    """Send requests to an endpoint from concurrency coroutines.
+
+    Queries run on whatever threads the views use, so only their mean
+    per request is known.
+
+    Returns:
+        dict: the statistics of the endpoint, see summarize()
+    """
+    clients = [driver.login(AsyncClient(raise_request_exception=False)) for _ in range(concurrency)]
+    remaining = iter(range(requests))
+    results = []
+
+    async def work(client):
+        for _ in remaining:
+            results.append(await driver.request(client, endpoint))
+
+    async def main():
+        await asyncio.gather(*(work(client) for client in clients))
+
+    counter = QueryCounter()
+    counter.watch_all()
+    try:
+        started = time.perf_counter()
+        async_to_sync(main)()
+        elapsed = time.perf_counter() - started
+    finally:
+        counter.unwatch_all()
+    return summarize(
+        [seconds for seconds, ok in results],
+        [counter.count / max(len(results), 1)],
+        sum(1 for seconds, ok in results if not ok),
+        elapsed
+    )
+
+
+def run(questions, choices, users, votes, requests, concurrency, endpoints,
+        seed_value=0, interface='wsgi'):
+    """Seed a throwaway database and benchmark the endpoints.
+
+    Args:
+        interface: 'wsgi' to send the requests from threads, 'asgi' to
+            send them as coroutines; the views used under ASGI follow
+            settings.POLLS_VIEW_MODE
+
+    Returns:
+        dict: the parameters of the run and the statistics per endpoint
+    """
+    rng = random.Random(seed_value)
+    report = {
+        'parameters': {
+            'questions': questions, 'choices': choices, 'users': users,
+            'votes': votes, 'requests': requests, 'concurrency': concurrency,
+            'seed': seed_value, 'database': connection.vendor, 'interface': interface,
+            'view_mode': settings.POLLS_VIEW_MODE,
+            'async_db_workers': settings.POLLS_ASYNC_DB_WORKERS,
+        },
+        'endpoints': {},
+    }
+    with BenchmarkDatabase(), override_settings(ALLOWED_HOSTS=['testserver']):
+        ids = seed(questions, choices, users, votes, rng)
+        if interface == 'asgi':
+            driver, run_one = ASGIDriver(*ids, rng), run_endpoint_asgi
+        else:
+            driver, run_one = WSGIDriver(*ids, rng), run_endpoint
+        for endpoint in endpoints:
+            report['endpoints'][endpoint] = run_one(driver, endpoint, requests, concurrency)
+    return report
+
+
+def run_contention(questions, choices, users, requests, concurrency, seed_value=0):
+    """Measure concurrent votes with and without the production profile.
+
+    Each profile gets its own throwaway SQLite database, so the journal
+    mode of one run does not leak into the other.  The development
+    profile opens a connection per request and sets no pragma; the
+    production one keeps connections open and sets
+    settings.SQLITE_PRODUCTION_PRAGMAS.
+
+    Returns:
+        dict: the parameters of the run and the statistics of the vote
+            endpoint per profile, where throughput is committed votes
+            per second and errors are mostly "database is locked"
+    """
+    report = {
+        'parameters': {
+            'questions': questions, 'choices': choices, 'users': users,
+            'requests': requests, 'concurrency': concurrency, 'seed': seed_value,
+            'database': connection.vendor, 'vote_mode': settings.POLLS_VOTE_MODE,
+            'pragmas': settings.SQLITE_PRODUCTION_PRAGMAS,
+        },
+        'profiles': {},
+    }
+    old_max_age = connection.settings_dict['CONN_MAX_AGE']
+    for profile in PROFILES:
+        production = profile == 'production'
+        rng = random.Random(seed_value)
+        pragmas = settings.SQLITE_PRODUCTION_PRAGMAS if production else {}
+        with override_settings(SQLITE_PRAGMAS=pragmas, ALLOWED_HOSTS=['testserver']):
+            # The threads share this settings dict with the main thread.
+            connection.settings_dict['CONN_MAX_AGE'] = None if production else 0
+            try:
+                with BenchmarkDatabase():
+                    ids = seed(questions, choices, users, 0, rng)
+                    report['profiles'][profile] = run_endpoint(
+                        WSGIDriver(*ids, rng), 'vote', requests, concurrency
+                    )
+            finally:
+                connection.settings_dict['CONN_MAX_AGE'] = old_max_age
+    return report
+
+
+def run_counters(choices, users, requests, concurrency, shards, seed_value=0):
+    """Measure concurrent votes on one poll with single-row and sharded tallies.
+
+    Every vote goes to the same question, as on a viral poll, once with
+    counter_shards set to 1 and once set to shards, each on its own
+    throwaway database with the current database settings.
+
+    Returns:
+        dict: the parameters of the run and the statistics of the vote
+            endpoint per layout, where throughput is committed votes
+            per second
+    """
+    report = {
+        'parameters': {
+            'choices': choices, 'users': users, 'requests': requests,
+            'concurrency': concurrency, 'shards': shards, 'seed': seed_value,
+            'database': connection.vendor, 'vote_mode': settings.POLLS_VOTE_MODE,
+        },
+        'layouts': {},
+    }
+    for layout in LAYOUTS:
+        rng = random.Random(seed_value)
+        with BenchmarkDatabase(), override_settings(ALLOWED_HOSTS=['testserver']):
+            ids = seed(1, choices, users, 0, rng)
+            Question.objects.update(counter_shards=shards if layout == 'sharded' else 1)
+            report['layouts'][layout] = run_endpoint(
+                WSGIDriver(*ids, rng), 'vote', requests, concurrency
+            )
+    return report
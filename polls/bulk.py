@@ -0,0 +1,112 @@
+"""Operations on many questions at once, for the admin and the commands.
+
+Each function runs in one transaction with a fixed number of statements
+however many questions are selected.  ``update()``, ``bulk_create()``
+and set-based deletes send no model signals, so the functions invalidate
+the index and the results cache themselves.  Resetting the votes of
+questions lives in polls.tallies with the other writes to the tallies.
+"""
+import datetime
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from .models import Question, Choice
+from .results_cache import touch_index
+
+REOPEN_DAYS = 7
+
+
+def _queryset(questions):
+    """Return the questions as a queryset reading from the primary."""
+    if not isinstance(questions, QuerySet):
+        questions = Question.objects.filter(pk__in=questions)
+    return questions.using(DEFAULT_DB_ALIAS)
+
+
+def close_questions(questions):
+    """End the voting of the questions now.
+
+    Questions that are already closed keep their end date.
+
+    Args:
+        questions: queryset or list of question ids
+
+    Returns:
+        int: the number of questions that were closed
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        closed = _queryset(questions).filter(end_date__gt=now).update(end_date=now)
+        transaction.on_commit(touch_index)
+    return closed
+
+
+def reopen_questions(questions, until=None):
+    """Let the questions take votes again until a later date.
+
+    Questions that end after that date keep their end date.
+
+    Args:
+        questions: queryset or list of question ids
+        until: the new end date, REOPEN_DAYS from now by default
+
+    Returns:
+        int: the number of questions that were reopened
+    """
+    if until is None:
+        until = timezone.now() + datetime.timedelta(days=REOPEN_DAYS)
+    with transaction.atomic():
+        reopened = _queryset(questions).filter(end_date__lt=until).update(end_date=until)
+        transaction.on_commit(touch_index)
+    return reopened
+
+
+def clone_questions(questions, shift=datetime.timedelta(0), suffix=''):
+    """Copy the questions and all their choices, without their votes.
+
+    The copies are written with one bulk insert of questions and one of
+    choices.
+
+    Args:
+        questions: queryset or list of question ids
+        shift: timedelta added to the dates of the copies
+        suffix: text appended to the text of the copies
+
+    Returns:
+        list: the new Question objects, in the order of their originals
+    """
+    with transaction.atomic():
+        originals = list(
+            _queryset(questions).order_by('pk').only(
+                'question_text', 'pub_date', 'end_date', 'counter_shards'
+            )
+        )
+        copies = Question.objects.bulk_create([
+            Question(
+                question_text=f'{question.question_text}{suffix}'[:200],
+                pub_date=question.pub_date + shift,
+                end_date=question.end_date + shift,
+                counter_shards=question.counter_shards,
+            )
+            for question in originals
+        ])
+        if copies and not connections[DEFAULT_DB_ALIAS].features.can_return_rows_from_bulk_insert:
+            # SQLite does not return the ids of a bulk insert.  The insert
+            # holds the write lock until the commit and ids only grow, so
+            # the newest rows are the copies, in the order they were given.
+            new_ids = Question.objects.using(DEFAULT_DB_ALIAS).order_by('-pk').values_list(
+                'pk', flat=True
+            )[:len(copies)]
+            for copy, pk in zip(copies, sorted(new_ids)):
+                copy.pk = pk
+        copy_ids = {original.pk: copy.pk for original, copy in zip(originals, copies)}
+        Choice.objects.bulk_create([
+            Choice(question_id=copy_ids[question_id], choice_text=choice_text)
+            for question_id, choice_text in Choice.objects.using(DEFAULT_DB_ALIAS).filter(
+                question_id__in=list(copy_ids)
+            ).order_by('pk').values_list('question_id', 'choice_text')
+        ])
+        transaction.on_commit(touch_index)
+    return copies
@@ -0,0 +1,78 @@
+"""Streaming export of the poll results and the raw votes.
+
+Rows are read with ``values_list().iterator()`` so no model instances
+are built and at most ``settings.POLLS_EXPORT_CHUNK_SIZE`` rows are held
+in memory, however large the table is.
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import Choice, Vote
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+RESULT_COLUMNS = ['question_id', 'question_text', 'choice_id', 'choice_text', 'votes']
+
+VOTE_COLUMNS = ['question_id', 'choice_id', 'username']
+
+
+def result_rows(question_ids=None, published_by=None):
+    """Yield the tally of every choice, ordered by question and choice.
+
+    Args:
+        question_ids: only export these questions, all of them by default
+        published_by: only export questions published at or before this
+            datetime, whatever their pub_date by default
+    """
+    choices = Choice.objects.all()
+    if question_ids:
+        choices = choices.filter(question_id__in=question_ids)
+    if published_by is not None:
+        choices = choices.filter(question__pub_date__lte=published_by)
+    return choices.annotate(total_votes=F('vote_count') + F('shard_votes')).order_by(
+        'question_id', 'pk'
+    ).values_list(
+        'question_id', 'question__question_text', 'pk', 'choice_text', 'total_votes'
+    ).iterator(chunk_size=settings.POLLS_EXPORT_CHUNK_SIZE)
+
+
+def vote_rows(question_ids=None):
+    """Yield the question, choice and username of every vote."""
+    votes = Vote.objects.all()
+    if question_ids:
+        votes = votes.filter(question_id__in=question_ids)
+    return votes.order_by('pk').values_list(
+        'question_id', 'choice_id', 'user__username'
+    ).iterator(chunk_size=settings.POLLS_EXPORT_CHUNK_SIZE)
+
+
+class _Echo:
+    """File-like object whose write() returns what it was given."""
+
+    def write(self, value):
+        return value
+
+
+def render(rows, columns, file_format):
+    """Yield the rows as lines of text in the given format.
+
+    Args:
+        rows: iterable of tuples with one value per column
+        columns: names of the columns
+        file_format: 'csv' for a header line then comma separated values,
+            'ndjson' for one JSON object per line
+    """
+    if file_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row))) + '\n'
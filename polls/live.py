@@ -0,0 +1,190 @@
+"""Live poll results sent as Server-Sent Events.
+
+Every question that has listeners gets a single feed.  The feed checks
+the results version of the question every ``POLLS_LIVE_INTERVAL``
+seconds, a cache lookup, and only when the version changed reads the
+results and sends the choices whose votes changed to every listener.
+A listener waiting for news costs an idle coroutine and no query, so
+one process can hold thousands of them.  When the question is deleted
+the feed ends the streams of its listeners.
+
+The stream is served by the ASGI application in mysite/asgi.py at
+``/polls/<question_id>/live/``.
+"""
+import asyncio
+import json
+import logging
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import results_cache
+from .models import Question
+
+logger = logging.getLogger(__name__)
+
+LIVE_PATH = re.compile(r'^/polls/(\d+)/live/$')
+
+
+class Listener:
+    """Changes waiting to be sent to one client."""
+
+    def __init__(self):
+        """Start with nothing to send."""
+        self.pending = {}
+        self.event = asyncio.Event()
+        self.closed = False
+
+    def push(self, changes):
+        """Merge the changes into the ones not sent yet."""
+        self.pending.update(changes)
+        self.event.set()
+
+    def close(self):
+        """Tell the client that no change will come any more."""
+        self.closed = True
+        self.event.set()
+
+    async def next(self):
+        """Wait for changes and return all of them, or None once closed."""
+        await self.event.wait()
+        changes, self.pending = self.pending, {}
+        if self.closed:
+            return changes or None
+        self.event.clear()
+        return changes
+
+
+class Feed:
+    """Poll the results of a question and fan them out to the listeners."""
+
+    def __init__(self, question_id, interval):
+        """Create the feed of a question, with no listener yet."""
+        self.question_id = question_id
+        self.interval = interval
+        self.listeners = set()
+        self.votes = {}
+        self.total = None
+        self.version = None
+        self.task = None
+
+    async def add(self, listener):
+        """Register a listener and give it the current results."""
+        if self.version is None:
+            await self.refresh()
+        self.listeners.add(listener)
+        listener.push(self.snapshot())
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    def remove(self, listener):
+        """Unregister a listener; the feed stops with its last listener."""
+        self.listeners.discard(listener)
+
+    def snapshot(self):
+        """Return every choice with its votes and the total."""
+        return dict(self.votes, total=self.total)
+
+    async def refresh(self):
+        """Read the results if they changed and return the changes."""
+        version = await sync_to_async(results_cache.get_version)(self.question_id)
+        if version == self.version:
+            return {}
+        results = await sync_to_async(results_cache.get_results)(self.question_id)
+        self.version = version
+        votes = {str(choice['id']): choice['votes'] for choice in results['choices']}
+        changes = {key: value for key, value in votes.items() if self.votes.get(key) != value}
+        if results['total'] != self.total:
+            changes['total'] = results['total']
+        self.votes, self.total = votes, results['total']
+        return changes
+
+    async def run(self):
+        """Send the changes to the listeners while there are any.
+
+        A failed refresh is logged and retried at the next interval,
+        except when the question is gone, which closes every listener.
+        """
+        try:
+            while self.listeners:
+                await asyncio.sleep(self.interval)
+                try:
+                    changes = await self.refresh()
+                except Question.DoesNotExist:
+                    for listener in self.listeners:
+                        listener.close()
+                    self.listeners.clear()
+                    break
+                except Exception:
+                    logger.exception('Refreshing the live results of question %s failed', self.question_id)
+                    continue
+                if changes:
+                    for listener in self.listeners:
+                        listener.push(changes)
+        finally:
+            self.task = None
+            if _feeds.get(self.question_id) is self and not self.listeners:
+                del _feeds[self.question_id]
+
+
+_feeds = {}
+
+
+def get_feed(question_id):
+    """Return the feed of a question, shared by all its listeners."""
+    if question_id not in _feeds:
+        _feeds[question_id] = Feed(question_id, settings.POLLS_LIVE_INTERVAL)
+    return _feeds[question_id]
+
+
+async def _wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def results_stream(scope, receive, send, question_id):
+    """ASGI application sending the live results of a question."""
+    try:
+        feed = get_feed(question_id)
+        listener = Listener()
+        await feed.add(listener)
+    except Question.DoesNotExist:
+        _feeds.pop(question_id, None)
+        await send({'type': 'http.response.start', 'status': 404, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        while True:
+            changes = asyncio.ensure_future(listener.next())
+            done, pending = await asyncio.wait(
+                [changes, disconnected], timeout=settings.POLLS_LIVE_KEEPALIVE,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnected in done:
+                changes.cancel()
+                break
+            if changes in done:
+                if changes.result() is None:
+                    await send({'type': 'http.response.body', 'body': b''})
+                    break
+                body = f'data: {json.dumps(changes.result())}\n\n'
+            else:
+                changes.cancel()
+                body = ': keep-alive\n\n'
+            await send({'type': 'http.response.body', 'body': body.encode(), 'more_body': True})
+    finally:
+        disconnected.cancel()
+        feed.remove(listener)
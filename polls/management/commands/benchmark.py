@@ -0,0 +1,67 @@
+"""Command to run the load benchmark of the polls pages."""
+import json
+import subprocess
+
+from django.core.management.base import BaseCommand
+
+from polls import benchmark
+
+
+class Command(BaseCommand):
+    """Benchmark the index, detail, vote and results pages."""
+
+    help = 'Seed a throwaway database and measure throughput, latency and queries per page.'
+
+    def add_arguments(self, parser):
+        """Add the command line options."""
+        parser.add_argument('--questions', type=int, default=100)
+        parser.add_argument('--choices', type=int, default=4, help='Choices per question.')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--votes', type=int, default=5000)
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random data.')
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints', choices=benchmark.ENDPOINTS,
+            help='Endpoint to benchmark, may be repeated. All by default.'
+        )
+        parser.add_argument(
+            '--interface', choices=['wsgi', 'asgi'], default='wsgi',
+            help='Handler to send the requests through. Under asgi the pages use '
+                 'the views chosen by POLLS_VIEW_MODE.'
+        )
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        """Run the benchmark and print or save the report."""
+        report = benchmark.run(
+            options['questions'], options['choices'], options['users'], options['votes'],
+            options['requests'], options['concurrency'],
+            options['endpoints'] or benchmark.ENDPOINTS, options['seed'],
+            options['interface']
+        )
+        report['commit'] = self.commit()
+        for endpoint, stats in report['endpoints'].items():
+            latency = stats['latency_ms']
+            self.stderr.write(
+                f"{endpoint:8} {stats['throughput']:8.1f} req/s  "
+                f"p50 {latency['p50']:6.1f} ms  p95 {latency['p95']:6.1f} ms  "
+                f"p99 {latency['p99']:6.1f} ms  {stats['queries_per_request']:.1f} queries  "
+                f"{stats['errors']} errors"
+            )
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                stream.write(text + '\n')
+        else:
+            self.stdout.write(text)
+
+    def commit(self):
+        """Return the git commit of the code being measured, if known."""
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL, universal_newlines=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
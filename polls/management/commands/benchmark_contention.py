@@ -0,0 +1,46 @@
+"""Command to measure concurrent votes with and without the production profile."""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from polls import benchmark
+
+
+class Command(BaseCommand):
+    """Compare the vote throughput of the development and production profiles."""
+
+    help = ('Send concurrent votes to a throwaway SQLite database, without and with '
+            'the production pragmas and persistent connections.')
+
+    def add_arguments(self, parser):
+        """Add the command line options."""
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--choices', type=int, default=4, help='Choices per question.')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=1000, help='Votes per profile.')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random data.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        """Run the benchmark and print or save the report."""
+        if connection.vendor != 'sqlite':
+            raise CommandError('The contention benchmark needs a SQLite database.')
+        report = benchmark.run_contention(
+            options['questions'], options['choices'], options['users'],
+            options['requests'], options['concurrency'], options['seed']
+        )
+        for profile, stats in report['profiles'].items():
+            latency = stats['latency_ms']
+            self.stderr.write(
+                f"{profile:12} {stats['throughput']:8.1f} votes/s  "
+                f"p50 {latency['p50']:6.1f} ms  p99 {latency['p99']:6.1f} ms  "
+                f"{stats['errors']} errors"
+            )
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                stream.write(text + '\n')
+        else:
+            self.stdout.write(text)
@@ -0,0 +1,45 @@
+"""Command to measure concurrent votes on one poll with and without counter shards."""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import benchmark
+
+
+class Command(BaseCommand):
+    """Compare the vote throughput of single-row and sharded tallies."""
+
+    help = ('Send concurrent votes to one poll of a throwaway database, with its '
+            'tallies in single rows and then in counter shards.')
+
+    def add_arguments(self, parser):
+        """Add the command line options."""
+        parser.add_argument('--choices', type=int, default=2, help='Choices of the poll.')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=1000, help='Votes per layout.')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--shards', type=int, default=8, help='Counter shards per choice.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random data.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        """Run the benchmark and print or save the report."""
+        if options['shards'] < 2:
+            raise CommandError('--shards must be at least 2.')
+        report = benchmark.run_counters(
+            options['choices'], options['users'], options['requests'],
+            options['concurrency'], options['shards'], options['seed']
+        )
+        for layout, stats in report['layouts'].items():
+            latency = stats['latency_ms']
+            self.stderr.write(
+                f"{layout:8} {stats['throughput']:8.1f} votes/s  "
+                f"p50 {latency['p50']:6.1f} ms  p99 {latency['p99']:6.1f} ms  "
+                f"{stats['errors']} errors"
+            )
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                stream.write(text + '\n')
+        else:
+            self.stdout.write(text)
@@ -0,0 +1,60 @@
+"""Command to close, reopen, reset or clone many questions at once."""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from polls import bulk, tallies
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    """Run one of the bulk question actions of the admin from the shell."""
+
+    help = 'Close, reopen, delete the votes of or clone many questions at once.'
+
+    def add_arguments(self, parser):
+        """Add the command line options."""
+        parser.add_argument('action', choices=['close', 'reopen', 'reset', 'clone'])
+        parser.add_argument(
+            'question_ids', nargs='*', type=int,
+            help='The questions to change.'
+        )
+        parser.add_argument(
+            '--prefix',
+            help='Also select the questions whose text starts with this, ignoring case.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=bulk.REOPEN_DAYS,
+            help='reopen: number of days from now the questions stay open.'
+        )
+        parser.add_argument(
+            '--shift-days', type=int, default=0,
+            help='clone: number of days added to the dates of the copies.'
+        )
+        parser.add_argument(
+            '--suffix', default='',
+            help='clone: text appended to the text of the copies.'
+        )
+
+    def handle(self, *args, **options):
+        """Select the questions and run the action on them."""
+        if not options['question_ids'] and options['prefix'] is None:
+            raise CommandError('Give question ids or --prefix.')
+        questions = Question.objects.filter(pk__in=options['question_ids'])
+        if options['prefix'] is not None:
+            questions |= Question.objects.filter(question_text__istartswith=options['prefix'])
+        action = options['action']
+        if action == 'close':
+            message = f'Closed {bulk.close_questions(questions)} polls.'
+        elif action == 'reopen':
+            until = timezone.now() + datetime.timedelta(days=options['days'])
+            message = f'Reopened {bulk.reopen_questions(questions, until)} polls.'
+        elif action == 'reset':
+            message = f'Deleted {tallies.reset_votes(questions)} votes.'
+        else:
+            copies = bulk.clone_questions(
+                questions, datetime.timedelta(days=options['shift_days']), options['suffix']
+            )
+            message = f'Cloned {len(copies)} questions.'
+        self.stdout.write(self.style.SUCCESS(message))
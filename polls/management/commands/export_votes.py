@@ -0,0 +1,35 @@
+"""Command to export the poll results or the raw votes."""
+from django.core.management.base import BaseCommand
+
+from polls import export
+
+
+class Command(BaseCommand):
+    """Stream the results or the votes as CSV or NDJSON."""
+
+    help = 'Export the tally of every choice or every vote as CSV or NDJSON.'
+
+    def add_arguments(self, parser):
+        """Add the command line options."""
+        parser.add_argument('kind', choices=['results', 'votes'])
+        parser.add_argument('--format', choices=list(export.FORMATS), default='csv')
+        parser.add_argument(
+            '--question', type=int, action='append', dest='question_ids',
+            help='Only export this question, may be repeated.'
+        )
+        parser.add_argument('--output', help='File to write, stdout by default.')
+
+    def handle(self, *args, **options):
+        """Write the export."""
+        if options['kind'] == 'results':
+            rows, columns = export.result_rows(options['question_ids']), export.RESULT_COLUMNS
+        else:
+            rows, columns = export.vote_rows(options['question_ids']), export.VOTE_COLUMNS
+        lines = export.render(rows, columns, options['format'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as stream:
+                stream.writelines(lines)
+        else:
+            self.stdout.ending = ''
+            for line in lines:
+                self.stdout.write(line)
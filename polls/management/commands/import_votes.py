@@ -0,0 +1,114 @@
+"""Command to import ballots from a CSV or JSON lines file."""
+import csv
+import json
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import tallies
+from polls.models import Choice
+
+
+def read_rows(stream, file_format):
+    """Yield (username, choice_id) of each ballot in the stream.
+
+    Args:
+        stream: text file with a header of username,choice for CSV, or
+            one {"username": ..., "choice": ...} object per line for JSONL
+        file_format: 'csv' or 'jsonl'
+    """
+    if file_format == 'csv':
+        for row in csv.DictReader(stream):
+            yield row['username'], row['choice']
+    else:
+        for line in stream:
+            if line.strip():
+                row = json.loads(line)
+                yield row['username'], row['choice']
+
+
+class Command(BaseCommand):
+    """Stream ballots into Vote rows with batched inserts.
+
+    Each batch is written in its own transaction by tallies.cast_votes(),
+    so the tallies are right after every batch and an interrupted import
+    can resume from the offset of the last committed batch.  A ballot
+    replaces the vote the user already has on the question.
+    """
+
+    help = 'Import votes from a CSV or JSON lines file of username and choice id.'
+
+    def add_arguments(self, parser):
+        """Add the command line options."""
+        parser.add_argument('path', help="File to import, or '-' for stdin.")
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help='Input format, guessed from the file extension by default.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows inserted per transaction.'
+        )
+        parser.add_argument(
+            '--offset', type=int,
+            help='Number of rows to skip, e.g. the last committed offset.'
+        )
+        parser.add_argument(
+            '--state-file',
+            help='File that keeps the last committed offset to resume from.'
+        )
+
+    def handle(self, *args, **options):
+        """Import the ballots."""
+        file_format = options['format']
+        if file_format is None:
+            file_format = 'jsonl' if options['path'].endswith(('.jsonl', '.ndjson')) else 'csv'
+        state_file = Path(options['state_file']) if options['state_file'] else None
+        offset = options['offset']
+        if offset is None:
+            offset = int(state_file.read_text()) if state_file and state_file.exists() else 0
+
+        users = dict(User.objects.values_list('username', 'id').iterator())
+        choices = dict(Choice.objects.values_list('id', 'question_id').iterator())
+
+        if options['path'] == '-':
+            stream = sys.stdin
+        else:
+            try:
+                stream = open(options['path'], newline='', encoding='utf-8')
+            except OSError as error:
+                raise CommandError(error)
+        imported = skipped = rows_read = 0
+        started = time.monotonic()
+        with stream:
+            rows = islice(read_rows(stream, file_format), offset, None)
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                votes = {}
+                for username, choice_id in batch:
+                    try:
+                        choice_id = int(choice_id)
+                        key = (choices[choice_id], users[username])
+                    except (KeyError, ValueError):
+                        skipped += 1
+                        continue
+                    votes[key] = choice_id
+                imported += tallies.cast_votes(votes)
+                offset += len(batch)
+                if state_file:
+                    state_file.write_text(str(offset))
+                rows_read += len(batch)
+                rate = rows_read / max(time.monotonic() - started, 1e-6)
+                self.stdout.write(
+                    f'offset {offset}: {imported} imported, {skipped} skipped, '
+                    f'{rate:.0f} rows/s'
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} votes, skipped {skipped} rows.'
+        ))
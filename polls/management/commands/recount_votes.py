@@ -0,0 +1,39 @@
+"""Command to check and rebuild the stored vote tallies."""
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import tallies
+
+
+class Command(BaseCommand):
+    """Compare Choice and Question vote counts with the Vote rows."""
+
+    help = 'Rebuild the stored vote tallies from the Vote rows.'
+
+    def add_arguments(self, parser):
+        """Add the command line options."""
+        parser.add_argument(
+            'question_ids', nargs='*', type=int,
+            help='Only recount these questions.'
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Report wrong tallies and exit with an error, without fixing them.'
+        )
+
+    def handle(self, *args, **options):
+        """Check or rebuild the tallies."""
+        questions = options['question_ids'] or None
+        if options['check']:
+            mismatches = tallies.find_mismatches(questions)
+        else:
+            mismatches = tallies.rebuild_tallies(questions)
+        for model, pk, stored, actual in mismatches:
+            self.stdout.write(
+                f'{model.__name__} {pk}: stored {stored}, counted {actual}'
+            )
+        if options['check'] and mismatches:
+            raise CommandError(f'{len(mismatches)} tallies are out of date.')
+        if options['check']:
+            self.stdout.write(self.style.SUCCESS('All tallies match.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(mismatches)} tallies.'))
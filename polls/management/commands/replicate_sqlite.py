@@ -0,0 +1,47 @@
+"""Command to copy a SQLite primary database to its replicas."""
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    """Copy the primary database over every SQLite read replica.
+
+    This is the replication step of a local setup with two SQLite
+    files; a real deployment replicates with its database server.
+    """
+
+    help = 'Copy the SQLite primary database to the SQLite read replicas.'
+
+    def add_arguments(self, parser):
+        """Add the command line options."""
+        parser.add_argument(
+            'replicas', nargs='*',
+            help='Aliases of the replicas to refresh, all of them by default.'
+        )
+
+    def handle(self, *args, **options):
+        """Copy the primary to each replica with the SQLite backup API."""
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('The primary database is not a SQLite database.')
+        aliases = options['replicas'] or settings.DATABASE_REPLICAS
+        for alias in aliases:
+            if alias not in settings.DATABASE_REPLICAS:
+                raise CommandError(f'{alias} is not a read replica.')
+            replica = connections[alias]
+            if replica.vendor != 'sqlite':
+                raise CommandError(f'The replica {alias} is not a SQLite database.')
+            replica.close()
+            # The backup API copies a consistent snapshot even while
+            # votes are being written to the primary.
+            source = sqlite3.connect(str(primary.settings_dict['NAME']))
+            target = sqlite3.connect(str(replica.settings_dict['NAME']))
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+            self.stdout.write(f'{alias}: copied from {DEFAULT_DB_ALIAS}')
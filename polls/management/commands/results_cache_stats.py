@@ -0,0 +1,27 @@
+"""Command to show how well the results cache is doing."""
+from django.core.management.base import BaseCommand
+
+from polls import results_cache
+
+
+class Command(BaseCommand):
+    """Print the hit and miss counters of the results cache."""
+
+    help = 'Show the hits and misses of the poll results cache.'
+
+    def add_arguments(self, parser):
+        """Add the command line options."""
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Set the counters back to zero after printing them.'
+        )
+
+    def handle(self, *args, **options):
+        """Print the counters."""
+        stats = results_cache.get_stats()
+        self.stdout.write(
+            f"hits: {stats['hits']}\nmisses: {stats['misses']}\n"
+            f"hit ratio: {stats['hit_ratio']:.2%}"
+        )
+        if options['reset']:
+            results_cache.reset_stats()
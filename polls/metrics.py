@@ -0,0 +1,28 @@
+"""Prometheus metrics of the polls application.
+
+When the ``PROMETHEUS_MULTIPROC_DIR`` environment variable names a
+directory, prometheus_client keeps the values in files there and the
+/metrics endpoint adds up every worker process, so the counters are
+right behind a pre-forking WSGI server.  Point it at an empty directory
+on every start and call ``prometheus_client.multiprocess.mark_process_dead``
+from the server's worker exit hook.
+"""
+from prometheus_client import Counter, Histogram
+
+REQUEST_LATENCY = Histogram(
+    'polls_request_latency_seconds', 'Time taken to answer a request.',
+    ['view', 'method']
+)
+
+DB_QUERIES = Counter(
+    'polls_db_queries', 'SQL queries run while answering requests.', ['view']
+)
+
+VOTES = Counter(
+    'polls_votes', 'Votes saved, new ones as cast and replaced ones as changed.',
+    ['kind']
+)
+
+RESULTS_CACHE = Counter(
+    'polls_results_cache_lookups', 'Lookups of the results cache.', ['result']
+)
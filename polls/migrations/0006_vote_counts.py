@@ -0,0 +1,39 @@
+# Generated by Django 3.2.7 on 2026-10-18 18:43
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_vote_counts(apps, schema_editor):
+    Vote = apps.get_model('polls', 'Vote')
+    Choice = apps.get_model('polls', 'Choice')
+    Question = apps.get_model('polls', 'Question')
+    db_alias = schema_editor.connection.alias
+    totals = {}
+    rows = Vote.objects.using(db_alias).values_list('question_id', 'choice_id').annotate(count=Count('id')).order_by()
+    for question_id, choice_id, count in rows:
+        Choice.objects.using(db_alias).filter(pk=choice_id).update(vote_count=count)
+        totals[question_id] = totals.get(question_id, 0) + count
+    for question_id, count in totals.items():
+        Question.objects.using(db_alias).filter(pk=question_id).update(vote_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0005_auto_20211029_1529'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='vote_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='vote_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='total votes'),
+        ),
+        migrations.RunPython(fill_vote_counts, migrations.RunPython.noop),
+    ]
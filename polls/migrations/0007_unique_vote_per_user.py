@@ -0,0 +1,46 @@
+# Generated by Django 3.2.7 on 2026-10-18 18:46
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    # Keep the latest vote of each user on a question, then recount the
+    # tallies of the questions that lost votes.
+    Vote = apps.get_model('polls', 'Vote')
+    Choice = apps.get_model('polls', 'Choice')
+    Question = apps.get_model('polls', 'Question')
+    db_alias = schema_editor.connection.alias
+    duplicates = (
+        Vote.objects.using(db_alias).values('question_id', 'user_id')
+        .annotate(latest=Max('id'), count=Count('id'))
+        .filter(count__gt=1).order_by()
+    )
+    question_ids = set()
+    for row in duplicates:
+        Vote.objects.using(db_alias).filter(
+            question_id=row['question_id'], user_id=row['user_id']
+        ).exclude(pk=row['latest']).delete()
+        question_ids.add(row['question_id'])
+    for question_id in question_ids:
+        total = 0
+        for choice in Choice.objects.using(db_alias).filter(question_id=question_id):
+            choice.vote_count = Vote.objects.using(db_alias).filter(choice=choice).count()
+            choice.save(using=db_alias, update_fields=['vote_count'])
+            total += choice.vote_count
+        Question.objects.using(db_alias).filter(pk=question_id).update(vote_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0006_vote_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('question', 'user'), name='unique_vote_per_user'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.7 on 2026-10-18 19:20
+
+from django.db import migrations
+import polls.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0009_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=polls.models.TextPrefixIndex(fields=['question_text'], name='question_text_prefix_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.7 on 2026-10-18 19:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0011_counter_shards'),
+    ]
+
+    operations = [
+        # The existing votes get no time, only the new ones default to now.
+        migrations.AddField(
+            model_name='vote',
+            name='voted_at',
+            field=models.DateTimeField(null=True, verbose_name='date voted'),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='voted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, null=True, verbose_name='date voted'),
+        ),
+        migrations.CreateModel(
+            name='VoteBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minute', models.DateTimeField()),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('count', models.IntegerField(default=0)),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='polls.choice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='polls.question')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='votebucket',
+            index=models.Index(fields=['question', 'minute'], name='vote_bucket_minute_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='votebucket',
+            constraint=models.UniqueConstraint(fields=('choice', 'minute', 'shard'), name='unique_vote_bucket'),
+        ),
+    ]
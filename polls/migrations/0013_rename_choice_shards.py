@@ -0,0 +1,19 @@
+# Generated by Django 3.2.7 on 2026-10-18 20:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0012_vote_history'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='choicecountershard',
+            name='choice',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='polls.choice'),
+        ),
+    ]
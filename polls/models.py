@@ -1,17 +1,104 @@
 """The models for polls application."""
 import datetime
 
+from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.backends.ddl_references import Columns
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib.auth.models import User
 
 
+UPCOMING = 'upcoming'
+OPEN = 'open'
+CLOSED = 'closed'
+
+
+class TextPrefixIndex(models.Index):
+    """Index of one text field serving its case insensitive prefix searches.
+
+    ``istartswith`` is a LIKE on SQLite, which only uses an index in the
+    NOCASE collation, and a LIKE of UPPER() on PostgreSQL, which only uses
+    an index of UPPER() with the text_pattern_ops operator class.  Other
+    databases get a plain index.
+    """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        """Index the field the way the database compares it in istartswith."""
+        statement = super().create_sql(model, schema_editor, using, **kwargs)
+        table = model._meta.db_table
+        column = model._meta.get_field(self.fields[0]).column
+        quote_name = schema_editor.quote_name
+        vendor = schema_editor.connection.vendor
+        if vendor == 'sqlite':
+            statement.parts['columns'] = Columns(
+                table, [column], quote_name, col_suffixes=['COLLATE NOCASE']
+            )
+        elif vendor == 'postgresql':
+            statement.parts['columns'] = Columns(
+                table, [column], lambda name: f'UPPER({quote_name(name)}::text)',
+                col_suffixes=['text_pattern_ops']
+            )
+        return statement
+
+
+class QuestionQuerySet(models.QuerySet):
+    """Questions filtered or annotated by their state, decided by the database.
+
+    A question is upcoming before its pub_date, open from its pub_date
+    to its end_date included and closed after.  Every method takes the
+    time to compare with, now by default, so one request can use a
+    single clock reading.
+    """
+
+    def upcoming(self, now=None):
+        """Return the questions that are not published yet."""
+        return self.filter(pub_date__gt=now or timezone.now())
+
+    def open(self, now=None):
+        """Return the questions that can be voted on."""
+        now = now or timezone.now()
+        return self.filter(pub_date__lte=now, end_date__gte=now)
+
+    def closed(self, now=None):
+        """Return the published questions whose voting has ended."""
+        now = now or timezone.now()
+        return self.filter(pub_date__lte=now, end_date__lt=now)
+
+    def with_state(self, now=None):
+        """Annotate the questions with their state, UPCOMING, OPEN or CLOSED."""
+        now = now or timezone.now()
+        return self.annotate(state=models.Case(
+            models.When(pub_date__gt=now, then=models.Value(UPCOMING)),
+            models.When(end_date__lt=now, then=models.Value(CLOSED)),
+            default=models.Value(OPEN),
+            output_field=models.CharField(),
+        ))
+
+
 class Question(models.Model):
     """Question model to representing the polls question."""
 
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField('date published')
     end_date = models.DateTimeField('date ended', default=timezone.now)
+    vote_count = models.PositiveIntegerField('total votes', default=0)
+    counter_shards = models.PositiveSmallIntegerField(
+        'counter shards', default=1, validators=[MinValueValidator(1)],
+        help_text='Number of rows each choice counts its votes in. More than one '
+                  'spreads the writes of a busy poll over several rows.'
+    )
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        """Indexes of the index page, the open questions and the admin search."""
+
+        indexes = [
+            models.Index(fields=['pub_date', 'id'], name='question_pub_date_idx'),
+            models.Index(fields=['end_date', 'pub_date'], name='question_open_idx'),
+            TextPrefixIndex(fields=['question_text'], name='question_text_prefix_idx'),
+        ]
 
     def was_published_recently(self):
         """Check the question was published recently.
@@ -48,23 +135,134 @@ class Question(models.Model):
         return self.question_text
 
 
+def shard_sum(owner='choice'):
+    """Return the sum of the counter shards of the outer choice or question.
+
+    Args:
+        owner: 'choice' or 'question', the model of the outer queryset
+
+    Returns:
+        Expression: the sum, 0 when there are no shards
+    """
+    shards = (
+        ChoiceCounterShard.objects.filter(**{owner: models.OuterRef('pk')}).order_by()
+        .values(owner).annotate(total=models.Sum('count')).values('total')
+    )
+    return Coalesce(models.Subquery(shards), 0)
+
+
+class ChoiceManager(models.Manager):
+    """Manager of choices that come with the sum of their counter shards."""
+
+    def get_queryset(self):
+        """Annotate the choices with shard_votes, read by Choice.votes."""
+        return super().get_queryset().annotate(shard_votes=shard_sum('choice'))
+
+
 class Choice(models.Model):
     """Choice model to representing the choice of polls question."""
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    vote_count = models.PositiveIntegerField(default=0)
+
+    objects = ChoiceManager()
 
     def __str__(self):
         """Return the content of choice text."""
         return self.choice_text
 
+    def refresh_from_db(self, *args, **kwargs):
+        """Reload the choice and forget the sum of its shards read before."""
+        self.__dict__.pop('shard_votes', None)
+        super().refresh_from_db(*args, **kwargs)
+
     @property
     def votes(self):
-        """Return the number of votes on the choice of polls question."""
-        return Vote.objects.filter(choice=self).count()
+        """Return the number of votes on the choice of polls question.
+
+        The value is the stored tally plus the counter shards of the
+        choice, kept in step with the Vote rows by polls.tallies, so it
+        never counts Vote rows.  Choices read through Choice.objects
+        already carry the sum of their shards; others, such as the
+        choice of a vote, read it with one query.
+        """
+        shard_votes = getattr(self, 'shard_votes', None)
+        if shard_votes is None:
+            shard_votes = self.shards.aggregate(total=models.Sum('count'))['total'] or 0
+        return self.vote_count + shard_votes
+
+
+class ChoiceCounterShard(models.Model):
+    """Part of the tally of a choice, for questions with sharded counters.
+
+    A vote on a question with more than one counter shard moves one of
+    the shards of the choice instead of the vote_count of the choice
+    and of the question.  A shard may be negative when the votes it
+    lost were counted in vote_count or in another shard; only the sum
+    is meaningful.
+    """
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+')
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE, related_name='shards')
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        """One row per shard of a choice."""
+
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'shard'], name='unique_counter_shard'),
+        ]
 
 
 class Vote(models.Model):
+    """Vote model to representing the choice of a user on a question.
+
+    voted_at is empty for the votes cast before the times were recorded.
+    """
+
     question = models.ForeignKey(Question, on_delete=models.CASCADE, default=0)
     user = models.ForeignKey(User, on_delete=models.CASCADE, default=0)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE, default=0)
+    voted_at = models.DateTimeField('date voted', default=timezone.now, null=True)
+
+    class Meta:
+        """One vote per user and question."""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=['question', 'user'], name='unique_vote_per_user'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'choice'], name='vote_question_choice_idx'),
+        ]
+
+
+class VoteBucket(models.Model):
+    """Net change of the votes of a choice during one minute.
+
+    Every vote adds one to the bucket of its choice for the minute it
+    was cast in, and a changed vote also takes one from the bucket of
+    the choice it left, so a bucket may be negative.  On a question with
+    counter shards the buckets are split by the same shards.
+    """
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+')
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE, related_name='+')
+    minute = models.DateTimeField()
+    shard = models.PositiveSmallIntegerField(default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        """One row per choice, minute and shard, read by question and minute."""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=['choice', 'minute', 'shard'], name='unique_vote_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'minute'], name='vote_bucket_minute_idx'),
+        ]
@@ -0,0 +1,257 @@
+"""Cache of the poll results, invalidated by a version per question.
+
+The results of a question are stored under a key that contains the
+current version of the question.  Every committed vote or edit of the
+question bumps the version, so the next read misses and recomputes the
+results while the old entry simply expires.  The backend is the cache
+alias named by ``settings.POLLS_RESULTS_CACHE``; a shared backend such
+as memcached or a file cache keeps many processes and nodes consistent.
+
+A local memory cache is private to each process, and the other workers
+never see the invalidations of a process.  On such a backend the
+versions, the index stamp and the open questions expire after
+``settings.POLLS_RESULTS_CACHE_TIMEOUT`` like the results, instead of
+being kept until they change.
+"""
+import functools
+import math
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Min
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .metrics import RESULTS_CACHE
+from .models import Question, Choice
+from . import tallies
+
+HITS_KEY = 'polls:results-cache:hits'
+MISSES_KEY = 'polls:results-cache:misses'
+INDEX_CHANGED_KEY = 'polls:index-changed'
+OPEN_IDS_KEY = 'polls:open-ids'
+
+
+def _cache():
+    """Return the cache backend used for the results."""
+    return caches[settings.POLLS_RESULTS_CACHE]
+
+
+def _state_timeout(cache):
+    """Return the timeout of the versions and the index stamp in the cache."""
+    return settings.POLLS_RESULTS_CACHE_TIMEOUT if isinstance(cache, LocMemCache) else None
+
+
+def _version_key(question_id):
+    return f'polls:results-version:{question_id}'
+
+
+def _new_version():
+    # A version made from the clock is larger than any version that was
+    # bumped before an eviction, so old entries are never served again.
+    return int(time.time() * 1000000)
+
+
+def _incr(cache, key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout=None):
+            return 1
+        return cache.incr(key)
+
+
+def get_version(question_id):
+    """Return the current results version of a question.
+
+    Args:
+        question_id: primary key of the question
+
+    Returns:
+        int: the version, created if the cache has none
+    """
+    cache = _cache()
+    key = _version_key(question_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=_state_timeout(cache))
+        version = cache.get(key)
+    return version
+
+
+def peek_version(question_id):
+    """Return the current results version of a question without creating one.
+
+    Args:
+        question_id: primary key of the question
+
+    Returns:
+        int: the version, or None if the cache has none
+    """
+    return _cache().get(_version_key(question_id))
+
+
+def bump_version(question_id):
+    """Invalidate the cached results of a question."""
+    cache = _cache()
+    key = _version_key(question_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=_state_timeout(cache))
+
+
+def get_index_changed():
+    """Return when a question was last added, edited or deleted.
+
+    Returns:
+        datetime: the time of the last change, or now if it is unknown
+    """
+    return datetime.fromtimestamp(_index_stamp(), tz=timezone.utc)
+
+
+def _index_stamp():
+    cache = _cache()
+    changed = cache.get(INDEX_CHANGED_KEY)
+    if changed is None:
+        cache.add(INDEX_CHANGED_KEY, time.time(), timeout=_state_timeout(cache))
+        changed = cache.get(INDEX_CHANGED_KEY)
+    return changed
+
+
+def touch_index():
+    """Record that the list of questions changed now."""
+    cache = _cache()
+    cache.set(INDEX_CHANGED_KEY, time.time(), timeout=_state_timeout(cache))
+
+
+def _compute_open_ids(now):
+    """Return the open question ids and when the set changes next."""
+    questions = Question.objects.using(DEFAULT_DB_ALIAS)
+    ids = frozenset(questions.open(now).values_list('pk', flat=True))
+    boundaries = [
+        questions.filter(pub_date__gt=now).aggregate(next=Min('pub_date'))['next'],
+        questions.filter(end_date__gte=now).aggregate(next=Min('end_date'))['next'],
+    ]
+    boundaries = [boundary.timestamp() for boundary in boundaries if boundary]
+    return ids, min(boundaries, default=None)
+
+
+def get_open_ids():
+    """Return the ids of the questions that can be voted on now.
+
+    The set is cached until the next pub_date or end_date is reached,
+    or until a question is added, edited or deleted, so the answer
+    costs no query while no poll changes state.
+
+    Returns:
+        frozenset: the ids of the open questions
+    """
+    cache = _cache()
+    cached = cache.get_many([OPEN_IDS_KEY, INDEX_CHANGED_KEY])
+    entry = cached.get(OPEN_IDS_KEY)
+    now = time.time()
+    # The entry records the index change it was computed after, so a
+    # question saved while it was being computed makes it stale.
+    if (
+        entry is not None and entry['changed'] == cached.get(INDEX_CHANGED_KEY)
+        and (entry['until'] is None or now < entry['until'])
+    ):
+        return entry['ids']
+    changed = _index_stamp()
+    ids, until = _compute_open_ids(datetime.fromtimestamp(now, tz=timezone.utc))
+    timeout = None if until is None else max(1, math.ceil(until - now))
+    state_timeout = _state_timeout(cache)
+    if state_timeout is not None:
+        timeout = state_timeout if timeout is None else min(timeout, state_timeout)
+    cache.set(OPEN_IDS_KEY, {'ids': ids, 'until': until, 'changed': changed}, timeout=timeout)
+    return ids
+
+
+def get_results(question_id):
+    """Return the results of a question, from the cache when possible.
+
+    Args:
+        question_id: primary key of the question
+
+    Returns:
+        dict: the results, see tallies.question_results()
+
+    Raises:
+        Question.DoesNotExist: if there is no such question
+    """
+    cache = _cache()
+    key = f'polls:results:{question_id}:{get_version(question_id)}'
+    results = cache.get(key)
+    if results is not None:
+        _incr(cache, HITS_KEY)
+        RESULTS_CACHE.labels('hit').inc()
+        return results
+    _incr(cache, MISSES_KEY)
+    RESULTS_CACHE.labels('miss').inc()
+    # Read from the primary: a lagging replica would store old results
+    # under the new version until the next vote.
+    try:
+        results = tallies.question_results(question_id, using=DEFAULT_DB_ALIAS)
+    except Question.DoesNotExist:
+        # Keep no version for ids that do not exist; a version made later
+        # from the clock is still larger than this one.
+        cache.delete(_version_key(question_id))
+        raise
+    cache.set(key, results, timeout=settings.POLLS_RESULTS_CACHE_TIMEOUT)
+    return results
+
+
+def get_stats():
+    """Return the number of cache hits and misses of the results.
+
+    Returns:
+        dict: hits, misses and the hit ratio
+    """
+    counts = _cache().get_many([HITS_KEY, MISSES_KEY])
+    hits = counts.get(HITS_KEY, 0)
+    misses = counts.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / lookups if lookups else 0.0,
+    }
+
+
+def reset_stats():
+    """Set the hit and miss counters back to zero."""
+    _cache().delete_many([HITS_KEY, MISSES_KEY])
+
+
+@receiver(tallies.tallies_changed)
+def invalidate_tallies(sender, question_ids, **kwargs):
+    """Bump the version of the questions whose tallies changed."""
+    for question_id in question_ids:
+        bump_version(question_id)
+
+
+def _invalidate(question_id, index=False):
+    bump_version(question_id)
+    if index:
+        touch_index()
+
+
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_question(sender, instance, using, **kwargs):
+    """Bump the version of a question that was edited or deleted.
+
+    This waits for the commit, so a concurrent request cannot cache the
+    old rows under the new version or index stamp.
+    """
+    transaction.on_commit(functools.partial(_invalidate, instance.pk, index=True), using=using)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def invalidate_choice(sender, instance, using, **kwargs):
+    """Bump the version of the question of a choice that changed, on commit."""
+    transaction.on_commit(functools.partial(_invalidate, instance.question_id), using=using)
@@ -0,0 +1,500 @@
+"""Stored vote tallies for polls questions and choices.
+
+Every Choice keeps its number of votes in ``vote_count`` and every
+Question keeps the total over its choices, so pages that show results
+read a handful of small rows instead of counting Vote rows.  The
+functions here are the only place that changes those columns.
+
+A question with more than one ``counter_shards`` spreads the writes of
+its votes over that many ChoiceCounterShard rows per choice, so
+concurrent votes on a busy poll do not all wait for the same row.  The
+votes of a choice are then its ``vote_count`` plus the sum of its
+shards, see Choice.votes, and the total of the question is the
+sum over its choices.  Only that sum is meaningful: a shard may be
+negative, and when the number of shards of a question changes its
+shards are folded back into ``vote_count``, see fold_shards().
+
+Every vote also records when it was cast or changed, and moves the
+VoteBucket of its choice for that minute, so the history of a poll is
+read from a few buckets rather than from the votes, see polls.trends.
+
+Once a change to the tallies of some questions is committed the
+``tallies_changed`` signal is sent with their ids.
+"""
+import functools
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, Q, QuerySet
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .metrics import VOTES
+from .models import Question, Choice, ChoiceCounterShard, Vote, VoteBucket, shard_sum
+
+tallies_changed = Signal()
+
+
+def notify_changed(question_ids):
+    """Send tallies_changed for the questions once the transaction commits."""
+    question_ids = list(question_ids)
+    if question_ids:
+        transaction.on_commit(
+            lambda: tallies_changed.send(sender=Question, question_ids=question_ids)
+        )
+
+
+def _can_upsert(connection):
+    """Return whether the database has INSERT ... ON CONFLICT ... RETURNING."""
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35)
+
+
+def _columns(model, values, connection):
+    """Return the quoted columns and database values of some fields of a model."""
+    fields = [model._meta.get_field(name) for name in values]
+    return (
+        [connection.ops.quote_name(field.column) for field in fields],
+        [field.get_db_prep_value(values[field.attname], connection) for field in fields],
+    )
+
+
+def _upsert_vote(connection, question_id, user_id, choice_id, now):
+    """Save a vote with one upsert and return the choice it had before.
+
+    The row of a user who already voted is only touched when the choice
+    differs, and RETURNING gives the row as the statement left it: the
+    new row for a first vote, the row still holding its old choice for a
+    changed vote, and nothing for an unchanged one.  A changed vote then
+    takes one more update of its choice.
+    """
+    table = connection.ops.quote_name(Vote._meta.db_table)
+    columns, params = _columns(Vote, {
+        'question_id': question_id, 'user_id': user_id, 'choice_id': choice_id, 'voted_at': now,
+    }, connection)
+    question, user, choice, voted_at = columns
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({", ".join(columns)}) VALUES (%s, %s, %s, %s) '
+            f'ON CONFLICT ({question}, {user}) DO UPDATE SET {voted_at} = excluded.{voted_at} '
+            f'WHERE {table}.{choice} <> excluded.{choice} RETURNING id, {choice}',
+            params
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return choice_id
+    vote_id, previous_choice_id = row
+    if previous_choice_id == choice_id:
+        return None
+    Vote.objects.filter(pk=vote_id).update(choice_id=choice_id)
+    return previous_choice_id
+
+
+def _save_vote(question, user, choice, now):
+    """Save the vote of a user and return the choice it had before, or None."""
+    connection = connections[router.db_for_write(Vote)]
+    if _can_upsert(connection):
+        return _upsert_vote(connection, question.pk, user.pk, choice.pk, now)
+    # Writing before reading takes the write lock when the transaction
+    # starts, so on SQLite a concurrent vote waits for busy_timeout
+    # instead of failing to upgrade its read lock.
+    try:
+        with transaction.atomic():
+            Vote.objects.create(question=question, user=user, choice=choice, voted_at=now)
+        return None
+    except IntegrityError:
+        vote_id, previous_choice_id = (
+            Vote.objects.select_for_update().filter(question=question, user=user)
+            .values_list('pk', 'choice_id').get()
+        )
+        if previous_choice_id != choice.pk:
+            Vote.objects.filter(pk=vote_id).update(choice=choice, voted_at=now)
+        return previous_choice_id
+
+
+def cast_vote(question, user, choice):
+    """Save the vote of a user on a question and move the tallies.
+
+    On PostgreSQL and SQLite 3.35 or later the Vote row is written with
+    one INSERT ... ON CONFLICT DO UPDATE ... RETURNING statement, which
+    also returns the previous choice, plus an UPDATE of the choice when
+    the vote changed.  Other databases insert the row in a savepoint,
+    and when the unique constraint on (question, user) rejects it, roll
+    back to the savepoint, lock the existing row and update it.  Either
+    way a user always has exactly one vote per question, even when
+    voting concurrently.
+
+    Args:
+        question: the Question that is voted on
+        user: the User who votes
+        choice: the Choice the user votes for
+
+    Returns:
+        int: id of the choice the user voted for before, or None
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        previous_choice_id = _save_vote(question, user, choice, now)
+        record_vote(
+            question.pk, choice.pk, previous_choice_id,
+            shards=question.counter_shards, user_id=user.pk, voted_at=now
+        )
+    return previous_choice_id
+
+
+def cast_votes(votes):
+    """Save many votes at once and move the tallies.
+
+    All Vote rows are written with one bulk insert and one bulk update,
+    and every touched tally row is updated once however many votes it
+    got.  The votes of a question with counter shards move the same
+    shards as record_vote() would.
+
+    Args:
+        votes: dict mapping (question_id, user_id) to the choice_id the
+            user votes for; later votes of a user must already have
+            replaced earlier ones
+
+    Returns:
+        int: the number of votes that changed a tally
+    """
+    if not votes:
+        return 0
+    by_question = {}
+    for question_id, user_id in votes:
+        by_question.setdefault(question_id, []).append(user_id)
+    lookup = Q()
+    for question_id, user_ids in by_question.items():
+        lookup |= Q(question_id=question_id, user_id__in=user_ids)
+    moves = {}
+    question_deltas = {}
+    now = timezone.now()
+    with transaction.atomic():
+        counter_shards = dict(
+            Question.objects.filter(pk__in=list(by_question)).values_list('pk', 'counter_shards')
+        )
+        existing = {
+            (vote.question_id, vote.user_id): vote
+            for vote in Vote.objects.select_for_update().filter(lookup).only(
+                'pk', 'question_id', 'user_id', 'choice_id'
+            )
+        }
+        new_votes = []
+        changed_votes = []
+        for (question_id, user_id), choice_id in votes.items():
+            shards = counter_shards.get(question_id, 1)
+            shard = _shard(user_id, shards)
+            vote = existing.get((question_id, user_id))
+            if vote is None:
+                new_votes.append(Vote(
+                    question_id=question_id, user_id=user_id, choice_id=choice_id, voted_at=now
+                ))
+                if shards == 1:
+                    question_deltas[question_id] = question_deltas.get(question_id, 0) + 1
+            elif vote.choice_id != choice_id:
+                key = (question_id, vote.choice_id, shard)
+                moves[key] = moves.get(key, 0) - 1
+                vote.choice_id = choice_id
+                vote.voted_at = now
+                changed_votes.append(vote)
+            else:
+                continue
+            key = (question_id, choice_id, shard)
+            moves[key] = moves.get(key, 0) + 1
+        Vote.objects.bulk_create(new_votes)
+        Vote.objects.bulk_update(changed_votes, ['choice', 'voted_at'])
+        minute = _minute(now)
+        for (question_id, choice_id, shard), delta in moves.items():
+            if delta:
+                _move(question_id, choice_id, delta, shard, counter_shards.get(question_id, 1))
+                _add(
+                    VoteBucket, delta, question_id=question_id, choice_id=choice_id,
+                    minute=minute, shard=shard
+                )
+        for question_id, delta in question_deltas.items():
+            Question.objects.filter(pk=question_id).update(vote_count=F('vote_count') + delta)
+        notify_changed(by_question)
+        # Count the votes once they are saved, not when rolled back.
+        transaction.on_commit(functools.partial(VOTES.labels('cast').inc, len(new_votes)))
+        transaction.on_commit(functools.partial(VOTES.labels('changed').inc, len(changed_votes)))
+    return len(new_votes) + len(changed_votes)
+
+
+def _add(model, delta, **lookup):
+    """Add delta to the count of the counter row matching lookup, creating it if needed.
+
+    Args:
+        model: ChoiceCounterShard or VoteBucket
+        delta: number to add, may be negative
+        lookup: the values of the unique key of the row, and its question_id
+    """
+    connection = connections[router.db_for_write(model)]
+    if _can_upsert(connection):
+        # One statement, keyed by the unique constraint of the row.
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns, params = _columns(model, dict(lookup, count=delta), connection)
+        count = columns[-1]
+        keys = [column for name, column in zip(lookup, columns) if name != 'question_id']
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(columns)}) '
+                f'VALUES ({", ".join(["%s"] * len(columns))}) '
+                f'ON CONFLICT ({", ".join(keys)}) DO UPDATE SET {count} = {table}.{count} + excluded.{count}',
+                params
+            )
+        return
+    rows = model.objects.filter(**lookup)
+    if rows.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(count=delta, **lookup)
+    except IntegrityError:
+        rows.update(count=F('count') + delta)
+
+
+def _shard(user_id, shards):
+    """Return the counter shard of a user on a question with that many shards."""
+    # The shard follows the user, so voters spread over the shards and a
+    # changed vote moves the same shard of both choices.
+    return (user_id or 0) % shards if shards > 1 else 0
+
+
+def _move(question_id, choice_id, delta, shard, shards):
+    """Add delta to the tally of a choice, in its shard if the question has several.
+
+    vote_count cannot go below zero.  A decrement it cannot take is for
+    votes still counted in shards, e.g. written by a request that saw
+    the old number of shards while they were folded, so the shards of
+    the question are folded again first.
+    """
+    if shards > 1:
+        _add(ChoiceCounterShard, delta, question_id=question_id, choice_id=choice_id, shard=shard)
+        return
+    rows = Choice.objects.filter(pk=choice_id)
+    if delta >= 0:
+        rows.update(vote_count=F('vote_count') + delta)
+    elif not rows.filter(vote_count__gte=-delta).update(vote_count=F('vote_count') + delta):
+        fold_shards([question_id])
+        rows.update(vote_count=F('vote_count') + delta)
+
+
+def _minute(moment):
+    """Return the start of the minute of a datetime, the key of its VoteBucket."""
+    return moment.replace(second=0, microsecond=0)
+
+
+def record_vote(question_id, choice_id, previous_choice_id=None, shards=1, user_id=None,
+                voted_at=None):
+    """Move the tallies for a vote that was just saved.
+
+    Must be called inside the transaction that saved the Vote.
+
+    Args:
+        question_id: id of the Question that was voted on
+        choice_id: id of the Choice the user voted for
+        previous_choice_id: id of the Choice the user voted for before,
+            or None when this is the first vote of the user on the question
+        shards: counter_shards of the question
+        user_id: id of the User who voted, picks the shard
+        voted_at: when the vote was saved, now by default
+    """
+    if previous_choice_id == choice_id:
+        return
+    shard = _shard(user_id, shards)
+    moves = [(choice_id, 1)]
+    if previous_choice_id is not None:
+        moves.append((previous_choice_id, -1))
+    minute = _minute(voted_at or timezone.now())
+    for moved_choice_id, delta in moves:
+        _move(question_id, moved_choice_id, delta, shard, shards)
+        _add(
+            VoteBucket, delta, question_id=question_id, choice_id=moved_choice_id,
+            minute=minute, shard=shard
+        )
+    if shards == 1 and previous_choice_id is None:
+        Question.objects.filter(pk=question_id).update(vote_count=F('vote_count') + 1)
+    transaction.on_commit(VOTES.labels('cast' if previous_choice_id is None else 'changed').inc)
+    notify_changed([question_id])
+
+
+def count_votes(questions=None):
+    """Count the Vote rows for each choice and question.
+
+    Args:
+        questions: optional queryset or list of question ids to limit to
+
+    Returns:
+        tuple: dicts mapping choice id and question id to its vote count
+    """
+    votes = Vote.objects.all()
+    if questions is not None:
+        votes = votes.filter(question__in=questions)
+    choice_counts = {}
+    question_counts = {}
+    rows = votes.values_list('question_id', 'choice_id').annotate(
+        count=Count('id')
+    ).order_by()
+    for question_id, choice_id, count in rows:
+        choice_counts[choice_id] = count
+        question_counts[question_id] = question_counts.get(question_id, 0) + count
+    return choice_counts, question_counts
+
+
+def find_mismatches(questions=None):
+    """Compare the stored tallies and their shards with the Vote rows.
+
+    Args:
+        questions: optional queryset or list of question ids to limit to
+
+    Returns:
+        list: (model, pk, stored, actual) for every tally that is wrong
+    """
+    choice_counts, question_counts = count_votes(questions)
+    choices = Choice.objects.all()
+    question_rows = Question.objects.all()
+    if questions is not None:
+        choices = choices.filter(question__in=questions)
+        question_rows = question_rows.filter(pk__in=questions)
+    mismatches = []
+    for model, rows, actual in (
+        (Choice, choices, choice_counts),
+        (Question, question_rows, question_counts),
+    ):
+        owner = 'choice' if model is Choice else 'question'
+        rows = rows.annotate(stored=F('vote_count') + shard_sum(owner))
+        for pk, stored in rows.values_list('pk', 'stored').iterator():
+            if stored != actual.get(pk, 0):
+                mismatches.append((model, pk, stored, actual.get(pk, 0)))
+    return mismatches
+
+
+def rebuild_tallies(questions=None):
+    """Rewrite the stored tallies that do not match the Vote rows.
+
+    Args:
+        questions: optional queryset or list of question ids to limit to
+
+    Returns:
+        list: the mismatches that were fixed, see find_mismatches()
+    """
+    with transaction.atomic():
+        mismatches = find_mismatches(questions)
+        choice_ids = [pk for model, pk, *counts in mismatches if model is Choice]
+        # A wrong choice gets its whole tally back in vote_count, then the
+        # totals of the questions are fixed against the remaining shards.
+        ChoiceCounterShard.objects.filter(choice_id__in=choice_ids).delete()
+        for model, pk, stored, actual in mismatches:
+            if model is Choice:
+                Choice.objects.filter(pk=pk).update(vote_count=actual)
+        question_ids = {pk for model, pk, *counts in mismatches if model is Question}
+        question_ids.update(
+            Choice.objects.filter(pk__in=choice_ids).values_list('question_id', flat=True)
+        )
+        fixed = {(model, pk) for model, pk, *counts in mismatches}
+        if question_ids:
+            for model, pk, stored, actual in find_mismatches(list(question_ids)):
+                if model is not Question:
+                    continue
+                Question.objects.filter(pk=pk).update(
+                    vote_count=F('vote_count') + actual - stored
+                )
+                if (model, pk) not in fixed:
+                    mismatches.append((model, pk, stored, actual))
+        notify_changed(question_ids)
+    return mismatches
+
+
+def fold_shards(questions):
+    """Move the votes counted in the counter shards of questions back into vote_count.
+
+    Must be called when the counter_shards of a question changes, inside
+    the transaction that saved it: the later votes then never take from
+    vote_count a vote that was counted in a shard.  The totals do not
+    change.
+
+    Args:
+        questions: queryset or list of question ids
+    """
+    with transaction.atomic():
+        Choice.objects.filter(question__in=questions).update(
+            vote_count=F('vote_count') + shard_sum('choice')
+        )
+        Question.objects.filter(pk__in=questions).update(
+            vote_count=F('vote_count') + shard_sum('question')
+        )
+        ChoiceCounterShard.objects.filter(question__in=questions).delete()
+
+
+def reset_votes(questions):
+    """Delete every vote on the questions and set their tallies to zero.
+
+    Runs three DELETEs, of the votes, the counter shards and the vote
+    history, and two UPDATEs in one transaction however many questions
+    and votes there are.
+
+    Args:
+        questions: queryset or list of question ids
+
+    Returns:
+        int: the number of votes deleted
+    """
+    with transaction.atomic():
+        # Vote has no delete signals nor dependent rows, so Django deletes
+        # the rows with a single DELETE instead of loading them first.
+        deleted, _ = Vote.objects.filter(question__in=questions).delete()
+        ChoiceCounterShard.objects.filter(question__in=questions).delete()
+        VoteBucket.objects.filter(question__in=questions).delete()
+        Choice.objects.filter(question__in=questions, vote_count__gt=0).update(vote_count=0)
+        Question.objects.filter(pk__in=questions, vote_count__gt=0).update(vote_count=0)
+        if isinstance(questions, QuerySet):
+            questions = questions.values_list('pk', flat=True)
+        notify_changed(questions)
+    return deleted
+
+
+def percentage(votes, total):
+    """Return the share of the total the votes are, in percent to one decimal."""
+    return round(100 * votes / total, 1) if total else 0
+
+
+def question_results(question_id, using=None):
+    """Collect the results of a question.
+
+    The question comes joined to its choices and the sum of their
+    counter shards, so a question with choices costs a single query
+    however many choices it has.
+
+    Args:
+        question_id: primary key of the question
+        using: database alias to read from, the router picks one if None
+
+    Returns:
+        dict: the question, its choices with their votes and percentage
+            of the total, and the total number of votes
+
+    Raises:
+        Question.DoesNotExist: if there is no such question
+    """
+    choices = list(
+        Choice.objects.using(using).filter(question_id=question_id)
+        .select_related('question').order_by('pk')
+    )
+    if choices:
+        question = choices[0].question
+    else:
+        question = Question.objects.using(using).get(pk=question_id)
+    total = sum(choice.votes for choice in choices)
+    return {
+        'question': {'id': question.pk, 'question_text': question.question_text},
+        'choices': [
+            {
+                'id': choice.pk,
+                'choice_text': choice.choice_text,
+                'votes': choice.votes,
+                'percentage': percentage(choice.votes, total),
+            }
+            for choice in choices
+        ],
+        'total': total,
+    }
@@ -0,0 +1,81 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.shortcuts import reverse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from polls.admin import CappedCountPaginator
+from polls.models import Question
+
+
+def create_questions(count, start=0):
+    """Create published questions with two choices each."""
+    now = timezone.now()
+    for i in range(start, start + count):
+        question = Question.objects.create(
+            question_text=f'Admin question {i}',
+            pub_date=now - datetime.timedelta(hours=i),
+            end_date=now + datetime.timedelta(days=1 if i % 2 else -1)
+        )
+        question.choice_set.create(choice_text='yes')
+        question.choice_set.create(choice_text='no')
+
+
+class QuestionAdminTests(TestCase):
+    """Test for the question changelist of the admin site."""
+
+    def setUp(self):
+        """Initialize a logged in superuser."""
+        admin = User.objects.create_superuser(username='admin', password='dannysk123')
+        self.client.force_login(admin)
+        self.url = reverse('admin:polls_question_changelist')
+
+    def changelist_queries(self, **params):
+        """Return the response and the queries of a changelist page."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow(self):
+        """A page of the changelist costs the same queries however long it is."""
+        create_questions(5)
+        response, few = self.changelist_queries()
+        self.assertEqual(len(response.context['cl'].result_list), 5)
+        create_questions(95, start=5)
+        response, many = self.changelist_queries()
+        self.assertEqual(len(response.context['cl'].result_list), 100)
+        self.assertEqual(few, many)
+        # session, user, capped count and the annotated page
+        self.assertEqual(many, 4)
+
+    def test_annotated_columns(self):
+        """The rows show their state, choice and vote totals."""
+        create_questions(2)
+        response, _ = self.changelist_queries()
+        rows = {q.question_text: q for q in response.context['cl'].result_list}
+        self.assertTrue(rows['Admin question 1'].open)
+        self.assertFalse(rows['Admin question 0'].open)
+        self.assertTrue(rows['Admin question 0'].published)
+        self.assertEqual(rows['Admin question 0'].choice_total, 2)
+        self.assertContains(response, 'Choices')
+
+    def test_prefix_search(self):
+        """Searching matches the start of the question text."""
+        create_questions(12)
+        Question.objects.filter(question_text='Admin question 3').update(question_text='Zebra poll')
+        response, _ = self.changelist_queries(q='zeb')
+        self.assertEqual([q.question_text for q in response.context['cl'].result_list], ['Zebra poll'])
+        response, _ = self.changelist_queries(q='poll')
+        self.assertEqual(len(response.context['cl'].result_list), 0)
+
+    def test_capped_count(self):
+        """The paginator stops counting at its cap."""
+        create_questions(5)
+        paginator = CappedCountPaginator(Question.objects.order_by('pk'), 2)
+        paginator.cap = 3
+        self.assertEqual(paginator.count, 3)
+        self.assertEqual(paginator.num_pages, 2)
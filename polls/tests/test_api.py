@@ -0,0 +1,101 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from polls.models import Question
+from polls import tallies
+
+
+def create_question(question_text, days_open=30, days_published=1, choices=2):
+    """Create a question published days_published ago with the choices."""
+    now = timezone.now()
+    question = Question.objects.create(
+        question_text=question_text,
+        pub_date=now - datetime.timedelta(days=days_published),
+        end_date=now + datetime.timedelta(days=days_open)
+    )
+    for i in range(choices):
+        question.choice_set.create(choice_text=f'choice {i}')
+    return question
+
+
+class QuestionsAPITests(TestCase):
+    """Test for the batched JSON API of the questions."""
+
+    def setUp(self):
+        """Initialize an open and a closed question and a logged in voter."""
+        self.open = create_question('Open question')
+        self.closed = create_question('Closed question', days_open=-1, days_published=2)
+        self.user = User.objects.create_user(username='voter', password='dannysk123')
+        self.choice = self.open.choice_set.order_by('pk').last()
+        tallies.cast_vote(self.open, self.user, self.choice)
+        self.client.force_login(self.user)
+        self.url = reverse('polls:api_questions')
+
+    def get(self, **params):
+        """Return the decoded JSON of the API."""
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ids(self):
+        """The questions asked for come back in the order they were asked."""
+        data = self.get(ids=f'{self.closed.id},{self.open.id}')
+        self.assertEqual([q['id'] for q in data['questions']], [self.closed.id, self.open.id])
+        question = data['questions'][1]
+        self.assertEqual(question['total'], 1)
+        self.assertEqual(
+            [(c['votes'], c['percentage']) for c in question['choices']], [(0, 0), (1, 100.0)]
+        )
+        self.assertTrue(question['can_vote'])
+
+    def test_own_vote(self):
+        """Each question has the choice of the caller, if any."""
+        data = self.get(ids=f'{self.open.id},{self.closed.id}')
+        self.assertEqual([q['user_choice'] for q in data['questions']], [self.choice.id, None])
+        self.client.logout()
+        data = self.get(ids=str(self.open.id))
+        self.assertIsNone(data['questions'][0]['user_choice'])
+
+    def test_state_filter(self):
+        """Questions can be listed by state."""
+        self.assertEqual([q['id'] for q in self.get(state='open')['questions']], [self.open.id])
+        self.assertEqual([q['id'] for q in self.get(state='closed')['questions']], [self.closed.id])
+        self.assertEqual(len(self.get()['questions']), 2)
+
+    def test_unpublished_hidden(self):
+        """Questions that are not published yet are never returned."""
+        future = create_question('Future question', days_published=-1)
+        self.assertEqual(self.get(ids=str(future.id))['questions'], [])
+        self.assertNotIn(future.id, [q['id'] for q in self.get()['questions']])
+
+    @override_settings(POLLS_API_MAX_QUESTIONS=1)
+    def test_cursor(self):
+        """The next questions are reached with the cursor."""
+        first = self.get()
+        self.assertEqual([q['id'] for q in first['questions']], [self.open.id])
+        second = self.get(cursor=first['next_cursor'])
+        self.assertEqual([q['id'] for q in second['questions']], [self.closed.id])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_bad_requests(self):
+        """Invalid parameters are answered with 400."""
+        for params in ({'ids': '1,x'}, {'state': 'pending'}, {'cursor': 'nope'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
+        with self.settings(POLLS_API_MAX_QUESTIONS=1):
+            response = self.client.get(self.url, {'ids': f'{self.open.id},{self.closed.id}'})
+            self.assertEqual(response.status_code, 400)
+
+    def test_query_count_does_not_grow(self):
+        """The same number of queries answers for 1, 5 or 20 questions."""
+        ids = [create_question(f'Question {i}', choices=3).id for i in range(20)]
+        # session, user, questions, choices and the caller's votes
+        for count in (1, 5, 20):
+            with self.assertNumQueries(5):
+                data = self.get(ids=','.join(map(str, ids[:count])))
+            self.assertEqual(len(data['questions']), count)
@@ -0,0 +1,90 @@
+import datetime
+import json
+import logging
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import include, path
+from django.utils import timezone
+
+from polls.models import Question, Vote
+from polls.urls import build_urlpatterns
+
+urlpatterns = [
+    path('polls/', include((build_urlpatterns('async'), 'polls'))),
+    path('accounts/', include('django.contrib.auth.urls')),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewTests(TransactionTestCase):
+    """Test for the async detail, vote and results views.
+
+    The views query the database from their own threads, so the data
+    is committed rather than kept in a test transaction.
+    """
+
+    def setUp(self):
+        """Initialize a user and the question with choices."""
+        cache.clear()
+        self.question = Question.objects.create(
+            question_text='Async question',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=30)
+        )
+        self.choice = self.question.choice_set.create(choice_text='async choice')
+        self.user = User.objects.create_user(username='async', password='dannysk123')
+        self.client = AsyncClient()
+
+    def test_results(self):
+        """The async results view renders the results."""
+        response = async_to_sync(self.client.get)(f'/polls/{self.question.id}/results/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Async question')
+
+    def test_missing_question(self):
+        """The async detail view of a missing question is not found."""
+        self.client.force_login(self.user)
+        response = async_to_sync(self.client.get)('/polls/404/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_vote(self):
+        """A logged in user can vote through the async vote view."""
+        self.client.force_login(self.user)
+        response = async_to_sync(self.client.post)(
+            f'/polls/{self.question.id}/vote/', f'choice={self.choice.id}',
+            content_type='application/x-www-form-urlencoded'
+        )
+        self.assertRedirects(
+            response, f'/polls/{self.question.id}/results/', fetch_redirect_response=False
+        )
+        self.assertTrue(Vote.objects.filter(user=self.user, choice=self.choice).exists())
+
+    def test_vote_needs_login(self):
+        """An anonymous vote is sent to the login page."""
+        response = async_to_sync(self.client.post)(
+            f'/polls/{self.question.id}/vote/', f'choice={self.choice.id}',
+            content_type='application/x-www-form-urlencoded'
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/accounts/login/', response.url)
+
+    @override_settings(DEBUG=True)
+    def test_async_middleware_chain(self):
+        """Under ASGI no middleware has to be adapted to run in a thread."""
+        with self.assertLogs('django.request', 'DEBUG') as logs:
+            ASGIHandler()
+            logging.getLogger('django.request').debug('Loaded')
+        self.assertEqual([record.getMessage() for record in logs.records], ['Loaded'])
+
+    def test_timing_counts_pool_queries(self):
+        """The queries and rendering in the pool threads are timed."""
+        with self.assertLogs('mysite.timing', 'INFO') as logs:
+            response = async_to_sync(self.client.get)(f'/polls/{self.question.id}/results/')
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertGreater(line['queries'], 0)
+        self.assertGreater(line['template_ms'], 0)
+        self.assertIn(f'desc="{line["queries"]} queries"', response['Server-Timing'])
@@ -1,9 +1,13 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
 from polls.models import Question, Choice
 from django.utils import timezone
 
+
 class UserAuthTest(TestCase):
 
     def setUp(self):
@@ -33,4 +37,74 @@ class UserAuthTest(TestCase):
         logout_url = reverse("logout")
         response = self.client.post(logout_url)
         self.assertEqual(302, response.status_code)
-        self.assertRedirects(response, reverse("polls:index"))
\ No newline at end of file
+        self.assertRedirects(response, reverse("polls:index"))
+
+
+class SessionModeTest(TestCase):
+    """Test cases for the cached sessions and users of the faster auth modes."""
+
+    backends = ('polls.auth.CachedModelBackend', 'django.contrib.auth.backends.ModelBackend')
+
+    def setUp(self):
+        """Initialize a user and an empty cache."""
+        cache.clear()
+        self.user = User.objects.create_user(username='cached', password='FatChance!')
+
+    def auth_queries(self, url):
+        """Request the url and return its queries on the users and sessions."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            query['sql'] for query in queries
+            if 'auth_user' in query['sql'] or 'django_session' in query['sql']
+        ]
+
+    def check_no_auth_queries(self):
+        """After a first request the pages do not read users or sessions."""
+        self.client.post(reverse('login'), {'username': 'cached', 'password': 'FatChance!'})
+        self.client.get(reverse('polls:index'))
+        self.assertEqual(self.auth_queries(reverse('polls:index')), [])
+
+    def test_cookie_mode(self):
+        """Signed cookie sessions and the cached user need no query."""
+        with self.settings(
+            SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies',
+            AUTHENTICATION_BACKENDS=self.backends
+        ):
+            self.check_no_auth_queries()
+
+    def test_cache_mode(self):
+        """Cached sessions and the cached user need no query."""
+        with self.settings(
+            SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+            AUTHENTICATION_BACKENDS=self.backends
+        ):
+            self.check_no_auth_queries()
+
+    def test_password_change(self):
+        """Changing the password logs the sessions out despite the cache."""
+        with self.settings(AUTHENTICATION_BACKENDS=self.backends):
+            self.client.post(reverse('login'), {'username': 'cached', 'password': 'FatChance!'})
+            self.client.get(reverse('polls:index'))
+            self.user.set_password('NewChance!')
+            self.user.save()
+            response = self.client.get(reverse('polls:index'))
+            self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_logout_forgets_user(self):
+        """Logging out drops the cached user."""
+        with self.settings(AUTHENTICATION_BACKENDS=self.backends):
+            self.client.post(reverse('login'), {'username': 'cached', 'password': 'FatChance!'})
+            self.client.get(reverse('polls:index'))
+            self.assertIsNotNone(cache.get(f'auth:user:{self.user.pk}'))
+            self.client.post(reverse('logout'))
+            self.assertIsNone(cache.get(f'auth:user:{self.user.pk}'))
+
+    def test_signup_logs_in(self):
+        """A new user is logged in after signing up."""
+        self.client.post(reverse('signup'), {
+            'username': 'newcomer', 'password1': 'FatChance!2', 'password2': 'FatChance!2'
+        })
+        response = self.client.get(reverse('polls:index'))
+        self.assertEqual(response.context['user'].username, 'newcomer')
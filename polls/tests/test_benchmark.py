@@ -0,0 +1,56 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase
+
+from polls import benchmark
+from polls.models import Question
+
+
+class BenchmarkReportTests(SimpleTestCase):
+    """Test for the statistics of the load benchmark."""
+
+    def test_percentiles(self):
+        """Percentiles are read from the sorted latencies."""
+        values = [i / 1000 for i in range(1, 101)]
+        self.assertAlmostEqual(benchmark.percentile(values, 50), 0.0505)
+        self.assertAlmostEqual(benchmark.percentile(values, 99), 0.09901)
+        self.assertEqual(benchmark.percentile([0.2], 95), 0.2)
+
+    def test_summarize(self):
+        """The summary has the throughput, latencies and queries."""
+        stats = benchmark.summarize([0.01, 0.03], [2, 4], 1, 0.5)
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(stats['throughput'], 4)
+        self.assertAlmostEqual(stats['latency_ms']['mean'], 20)
+        self.assertEqual(stats['queries_per_request'], 3)
+
+
+class BenchmarkCommandTests(TransactionTestCase):
+    """Test for the benchmark command on a tiny database."""
+
+    def test_report(self):
+        """The command reports every endpoint with its queries per request."""
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'benchmark', '--questions', '2', '--choices', '2', '--users', '3', '--votes', '2',
+            '--requests', '3', '--concurrency', '1', stdout=stdout, stderr=stderr
+        )
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(report['parameters']['requests'], 3)
+        self.assertEqual(report['parameters']['interface'], 'wsgi')
+        self.assertIn('commit', report)
+        self.assertEqual(list(report['endpoints']), ['index', 'detail', 'vote', 'results'])
+        for endpoint, stats in report['endpoints'].items():
+            self.assertEqual(stats['requests'], 3, endpoint)
+            self.assertEqual(stats['errors'], 0, endpoint)
+            self.assertGreater(stats['throughput'], 0, endpoint)
+            self.assertEqual(
+                set(stats['latency_ms']), {'mean', 'p50', 'p95', 'p99'}, endpoint
+            )
+            self.assertGreater(stats['queries_per_request'], 0, endpoint)
+            self.assertIn(f"{stats['queries_per_request']:.1f} queries", stderr.getvalue())
+        # The test database is back in place.
+        self.assertFalse(Question.objects.exists())
@@ -0,0 +1,205 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.shortcuts import reverse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from polls import bulk, results_cache, tallies
+from polls.models import Question, Choice, Vote
+
+
+def create_questions(count, voters=()):
+    """Create open questions with two choices each and a vote per voter."""
+    now = timezone.now()
+    questions = []
+    for i in range(count):
+        question = Question.objects.create(
+            question_text=f'Bulk question {i}',
+            pub_date=now - datetime.timedelta(days=1),
+            end_date=now + datetime.timedelta(days=1)
+        )
+        choice = question.choice_set.create(choice_text='yes')
+        question.choice_set.create(choice_text='no')
+        for user in voters:
+            tallies.cast_vote(question, user, choice)
+        questions.append(question)
+    return questions
+
+
+class BulkOperationTests(TestCase):
+    """Test cases for the operations on many questions at once."""
+
+    def setUp(self):
+        """Initialize two voters and clear the cache."""
+        cache.clear()
+        self.voters = [
+            User.objects.create_user(username=f'bulk{i}', password='bulk123') for i in range(2)
+        ]
+
+    def queries(self, operation, questions):
+        """Return the number of queries of an operation on the questions."""
+        ids = [question.pk for question in questions]
+        with CaptureQueriesContext(connection) as captured:
+            operation(Question.objects.filter(pk__in=ids))
+        return len(captured)
+
+    def assertConstantQueries(self, operation):
+        """Assert an operation costs the same on 2 and on 20 questions."""
+        few = self.queries(operation, create_questions(2, self.voters))
+        many = self.queries(operation, create_questions(20, self.voters))
+        self.assertEqual(few, many)
+
+    def test_close(self):
+        """Closing ends the voting now and keeps earlier end dates."""
+        open_question, closed_question = create_questions(2)
+        ended = timezone.now() - datetime.timedelta(days=2)
+        Question.objects.filter(pk=closed_question.pk).update(end_date=ended)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(bulk.close_questions([open_question.pk, closed_question.pk]), 1)
+        open_question.refresh_from_db()
+        closed_question.refresh_from_db()
+        self.assertFalse(open_question.can_vote())
+        self.assertEqual(closed_question.end_date, ended)
+
+    def test_close_touches_index(self):
+        """Closing changes the index, though update() sends no signal."""
+        question, = create_questions(1)
+        before = results_cache.get_index_changed()
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk.close_questions([question.pk])
+        self.assertGreater(results_cache.get_index_changed(), before)
+
+    def test_reopen(self):
+        """Reopening lets a closed question take votes until the new date."""
+        question, = create_questions(1)
+        bulk.close_questions([question.pk])
+        until = timezone.now() + datetime.timedelta(days=3)
+        self.assertEqual(bulk.reopen_questions([question.pk], until), 1)
+        question.refresh_from_db()
+        self.assertEqual(question.end_date, until)
+        self.assertTrue(question.can_vote())
+
+    def test_reset_votes(self):
+        """Resetting deletes the votes and zeroes the tallies."""
+        question, other = create_questions(2, self.voters)
+        version = results_cache.get_version(question.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(tallies.reset_votes(Question.objects.filter(pk=question.pk)), 2)
+        self.assertFalse(Vote.objects.filter(question=question).exists())
+        self.assertEqual(Vote.objects.filter(question=other).count(), 2)
+        self.assertEqual(tallies.find_mismatches(), [])
+        self.assertEqual(Question.objects.get(pk=question.pk).vote_count, 0)
+        self.assertNotEqual(results_cache.get_version(question.pk), version)
+
+    def test_clone(self):
+        """Cloning copies the questions and choices, without the votes."""
+        originals = create_questions(3, self.voters)
+        shift = datetime.timedelta(days=120)
+        copies = bulk.clone_questions([q.pk for q in originals], shift, ' (spring)')
+        self.assertEqual(len(copies), 3)
+        for original, copy in zip(originals, copies):
+            self.assertNotEqual(copy.pk, original.pk)
+            copy = Question.objects.get(pk=copy.pk)
+            self.assertEqual(copy.question_text, f'{original.question_text} (spring)')
+            self.assertEqual(copy.pub_date, original.pub_date + shift)
+            self.assertEqual(copy.vote_count, 0)
+            self.assertEqual(
+                list(copy.choice_set.order_by('pk').values_list('choice_text', 'vote_count')),
+                [('yes', 0), ('no', 0)]
+            )
+
+    def test_constant_queries(self):
+        """Every operation costs the same however many questions it changes."""
+        self.assertConstantQueries(bulk.close_questions)
+        self.assertConstantQueries(bulk.reopen_questions)
+        self.assertConstantQueries(tallies.reset_votes)
+        self.assertConstantQueries(bulk.clone_questions)
+
+    def test_reset_single_delete(self):
+        """The votes, shards and buckets are deleted without being loaded first."""
+        questions = create_questions(5, self.voters)
+        with CaptureQueriesContext(connection) as captured:
+            tallies.reset_votes([question.pk for question in questions])
+        statements = [query['sql'].split()[0] for query in captured]
+        self.assertEqual(statements.count('DELETE'), 3)
+        self.assertNotIn('SELECT', statements)
+
+
+class BulkAdminActionTests(TestCase):
+    """Test cases for the bulk actions of the question changelist."""
+
+    def setUp(self):
+        """Initialize a logged in superuser and two questions."""
+        cache.clear()
+        admin = User.objects.create_superuser(username='admin', password='dannysk123')
+        self.client.force_login(admin)
+        self.questions = create_questions(2, [admin])
+
+    def run_action(self, action, **data):
+        """Run an action of the changelist on both questions."""
+        return self.client.post(reverse('admin:polls_question_changelist'), {
+            'action': action,
+            '_selected_action': [question.pk for question in self.questions],
+            **data,
+        }, follow=True)
+
+    def test_close_action(self):
+        """The close action closes the selected polls."""
+        response = self.run_action('close_polls')
+        self.assertContains(response, 'Closed 2 polls.')
+        self.assertFalse(Question.objects.filter(end_date__gt=timezone.now()).exists())
+
+    def test_reset_action_confirmation(self):
+        """The reset action first asks for a confirmation and deletes nothing."""
+        response = self.run_action('reset_votes')
+        self.assertTemplateUsed(response, 'admin/polls/question/reset_votes_confirmation.html')
+        self.assertContains(response, 'delete the 2 votes of the selected polls')
+        self.assertContains(response, '<input type="hidden" name="post" value="yes">', html=True)
+        self.assertEqual(Vote.objects.count(), 2)
+
+    def test_reset_action(self):
+        """The confirmed reset action deletes the votes of the selected polls."""
+        response = self.run_action('reset_votes', post='yes')
+        self.assertContains(response, 'Deleted 2 votes.')
+        self.assertEqual(Vote.objects.count(), 0)
+
+    def test_clone_action(self):
+        """The clone action copies the selected questions and their choices."""
+        response = self.run_action('clone_questions')
+        self.assertContains(response, 'Cloned 2 questions.')
+        self.assertEqual(Question.objects.filter(question_text__endswith=' (copy)').count(), 2)
+        self.assertEqual(Choice.objects.count(), 8)
+
+
+class BulkCommandTests(TestCase):
+    """Test cases for the bulk_questions management command."""
+
+    def setUp(self):
+        """Initialize two questions."""
+        self.questions = create_questions(2)
+
+    def test_prefix(self):
+        """Questions can be selected by the start of their text."""
+        call_command('bulk_questions', 'close', '--prefix', 'bulk QUESTION', stdout=StringIO())
+        self.assertFalse(Question.objects.filter(end_date__gt=timezone.now()).exists())
+
+    def test_clone(self):
+        """The clone command shifts the dates of the copies."""
+        call_command(
+            'bulk_questions', 'clone', str(self.questions[0].pk), '--shift-days', '7',
+            stdout=StringIO()
+        )
+        copy = Question.objects.latest('pk')
+        self.assertEqual(copy.pub_date, self.questions[0].pub_date + datetime.timedelta(days=7))
+
+    def test_no_selection(self):
+        """The command refuses to run without questions."""
+        with self.assertRaises(CommandError):
+            call_command('bulk_questions', 'reset')
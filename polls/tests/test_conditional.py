@@ -0,0 +1,76 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from django.shortcuts import reverse
+from django.contrib.auth.models import User
+
+from polls import results_cache
+from polls.models import Question
+
+
+class ConditionalGetTests(TestCase):
+    """Test for the ETag and Last-Modified validators."""
+
+    def setUp(self):
+        """Initialize an open question with a choice."""
+        cache.clear()
+        self.question = Question.objects.create(
+            question_text='Conditional question',
+            pub_date=timezone.now() - datetime.timedelta(days=1),
+            end_date=timezone.now() + datetime.timedelta(days=1)
+        )
+        self.choice = self.question.choice_set.create(choice_text='conditional')
+        self.results = reverse('polls:results', args=(self.question.id,))
+
+    def test_results_not_modified(self):
+        """An unchanged results page is answered with 304 and no query."""
+        # The first request caches the results and creates their version.
+        self.assertNotIn('ETag', self.client.get(self.results))
+        etag = self.client.get(self.results)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.results, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_results_modified_by_vote(self):
+        """A vote on the question changes the results ETag."""
+        self.client.get(self.results)
+        etag = self.client.get(self.results)['ETag']
+        user = User.objects.create_user(username='conditional', password='dannysk123')
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.choice.id})
+        response = self.client.get(self.results, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_results_create_no_version(self):
+        """Requests for a question that does not exist leave no version behind."""
+        url = reverse('polls:results', args=(self.question.id + 1,))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertIsNone(results_cache.peek_version(self.question.id + 1))
+
+    def test_index_not_modified(self):
+        """An unchanged index is answered with 304 without rendering."""
+        response = self.client.get(reverse('polls:index'))
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(reverse('polls:index'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIsNone(response.context)
+
+    def test_index_modified_by_new_question(self):
+        """Publishing a question changes the index ETag."""
+        etag = self.client.get(reverse('polls:index'))['ETag']
+        Question.objects.create(question_text='Newer question', pub_date=timezone.now())
+        response = self.client.get(reverse('polls:index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Newer question')
+
+    def test_index_etag_depends_on_user(self):
+        """Another user does not get the page rendered for someone else."""
+        etag = self.client.get(reverse('polls:index'))['ETag']
+        user = User.objects.create_user(username='other', password='dannysk123')
+        self.client.force_login(user)
+        response = self.client.get(reverse('polls:index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
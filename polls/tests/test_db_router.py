@@ -0,0 +1,115 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.http import HttpResponse
+from django.shortcuts import reverse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from mysite.db_router import PIN_COOKIE, PrimaryReplicaRouter, ReplicaPinningMiddleware
+from polls.models import Question, Choice, Vote
+
+
+@override_settings(DATABASE_REPLICAS=['replica0'])
+class PrimaryReplicaRouterTest(SimpleTestCase):
+    """Test cases for the routing of reads and writes."""
+
+    def setUp(self):
+        """Initialize the router and a request factory."""
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, cookies=None, write=None, model=Question):
+        """Return the alias of a read made during a request."""
+        request = self.factory.get('/polls/')
+        request.COOKIES.update(cookies or {})
+        reads = []
+
+        def view(request):
+            if write is not None:
+                self.router.db_for_write(write)
+            reads.append(self.router.db_for_read(model))
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(view)(request)
+        return reads[0], response
+
+    def test_other_reads_use_primary(self):
+        """Reads of users and sessions stay on the primary."""
+        self.assertEqual(self.route(model=User)[0], 'default')
+
+    def test_reads_outside_request_use_primary(self):
+        """Commands and background threads read from the primary."""
+        self.assertEqual(self.router.db_for_read(Choice), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Without replicas every read goes to the primary."""
+        self.assertEqual(self.route()[0], 'default')
+
+    def test_writes_use_primary(self):
+        """Writes always go to the primary."""
+        self.assertEqual(self.router.db_for_write(Vote), 'default')
+
+    def test_migrate_primary_only(self):
+        """Only the primary is migrated."""
+        self.assertTrue(self.router.allow_migrate('default', 'polls'))
+        self.assertFalse(self.router.allow_migrate('replica0', 'polls'))
+
+    def test_read_only_request(self):
+        """A request that only reads uses a replica and is not pinned."""
+        alias, response = self.route()
+        self.assertEqual(alias, 'replica0')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_write_pins_request(self):
+        """After a write the request reads from the primary and is pinned."""
+        alias, response = self.route(write=Vote)
+        self.assertEqual(alias, 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_user_write_does_not_pin(self):
+        """Writes outside the polls tables, e.g. sessions, do not pin."""
+        alias, response = self.route(write=User)
+        self.assertEqual(alias, 'replica0')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_cookie_pins_request(self):
+        """A client that wrote recently reads from the primary."""
+        alias, response = self.route(cookies={PIN_COOKIE: '1'})
+        self.assertEqual(alias, 'default')
+
+    def test_replicate_unknown_alias(self):
+        """Only the configured replicas can be overwritten."""
+        with self.assertRaises(CommandError):
+            call_command('replicate_sqlite', 'default')
+
+
+class ReadYourWritesTest(TestCase):
+    """Test cases for the pinning of a client after it voted."""
+
+    def setUp(self):
+        """Initialize a logged in user and a question with a choice."""
+        self.question = Question.objects.create(
+            question_text='Pinned question',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=30)
+        )
+        self.choice = self.question.choice_set.create(choice_text='Pinned choice')
+        User.objects.create_user(username='pinned', password='pinned123')
+        self.client.login(username='pinned', password='pinned123')
+
+    def test_vote_pins_client(self):
+        """Voting sets the cookie keeping the results on the primary."""
+        url = reverse('polls:vote', args=(self.question.id,))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'choice': self.choice.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_reading_does_not_pin(self):
+        """Reading the polls does not set the cookie."""
+        response = self.client.get(reverse('polls:index'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
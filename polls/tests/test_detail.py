@@ -1,5 +1,6 @@
 import datetime
 
+from django.core.cache import cache
 from django.test import TestCase
 from django.utils import timezone
 from django.shortcuts import reverse
@@ -14,6 +15,10 @@ def create_question(question_text, days):
 class QuestionDetailViewTests(TestCase):
     """Test for question in detail view."""
 
+    def setUp(self):
+        """Clear the cached open questions of earlier tests."""
+        cache.clear()
+
     def test_future_question(self):
         """The detail view of a question with a pub_date in the future.
 
@@ -0,0 +1,80 @@
+import datetime
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from django.shortcuts import reverse
+from django.contrib.auth.models import User
+
+from polls.models import Question
+from polls import tallies
+
+
+class ExportTests(TestCase):
+    """Test for the results and votes exports."""
+
+    def setUp(self):
+        """Initialize a question with a vote."""
+        self.question = Question.objects.create(
+            question_text='Exported question',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=30)
+        )
+        self.choice = self.question.choice_set.create(choice_text='exported')
+        self.question.choice_set.create(choice_text='other')
+        self.user = User.objects.create_user(username='exporter', password='dannysk123')
+        tallies.cast_vote(self.question, self.user, self.choice)
+
+    def test_results_csv(self):
+        """The results export streams a CSV line per choice."""
+        response = self.client.get(reverse('polls:export_results', args=('csv',)))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'question_id,question_text,choice_id,choice_text,votes')
+        self.assertEqual(lines[1], f'{self.question.id},Exported question,{self.choice.id},exported,1')
+        self.assertEqual(len(lines), 3)
+
+    def test_results_hide_unpublished(self):
+        """The results export leaves out questions that are not published yet."""
+        future = Question.objects.create(
+            question_text='Future question',
+            pub_date=timezone.now() + datetime.timedelta(days=1),
+            end_date=timezone.now() + datetime.timedelta(days=30)
+        )
+        future.choice_set.create(choice_text='hidden')
+        response = self.client.get(reverse('polls:export_results', args=('csv',)))
+        content = b''.join(response.streaming_content).decode()
+        self.assertNotIn('Future question', content)
+        response = self.client.get(
+            reverse('polls:export_results', args=('csv',)), {'question': future.id}
+        )
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 1)
+
+    def test_votes_need_staff(self):
+        """Only staff members can download the raw votes."""
+        url = reverse('polls:export_votes', args=('ndjson',))
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        response = self.client.get(url, {'question': self.question.id})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(rows, [{
+            'question_id': self.question.id, 'choice_id': self.choice.id, 'username': 'exporter'
+        }])
+
+    def test_unknown_format(self):
+        """An unknown export format is not found."""
+        response = self.client.get(reverse('polls:export_results', args=('xml',)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_command(self):
+        """The export command writes the votes to stdout."""
+        out = StringIO()
+        call_command('export_votes', 'votes', stdout=out)
+        self.assertEqual(
+            out.getvalue().splitlines(),
+            ['question_id,choice_id,username', f'{self.question.id},{self.choice.id},exporter']
+        )
@@ -0,0 +1,66 @@
+import datetime
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth.models import User
+
+from polls.models import Question, Vote
+
+
+class ImportVotesTest(TestCase):
+    """Test cases for the import_votes command."""
+
+    def setUp(self):
+        """Initialize users and the question with choices."""
+        self.question = Question.objects.create(
+            question_text='Imported question',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=30)
+        )
+        self.first = self.question.choice_set.create(choice_text='first')
+        self.second = self.question.choice_set.create(choice_text='second')
+        for i in range(4):
+            User.objects.create_user(username=f'paper{i}', password='dannysk123')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        """Write a file in the temporary directory and return its path."""
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as stream:
+            stream.write(content)
+        return path
+
+    def test_import_csv(self):
+        """Ballots of known users and choices become votes with tallies."""
+        path = self.write('votes.csv', (
+            'username,choice\n'
+            f'paper0,{self.first.id}\n'
+            f'paper1,{self.second.id}\n'
+            f'paper2,{self.second.id}\n'
+            f'nobody,{self.first.id}\n'
+            'paper3,999\n'
+        ))
+        call_command('import_votes', path, '--batch-size', '2', stdout=StringIO())
+        self.assertEqual(Vote.objects.count(), 3)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.vote_count, 3)
+        self.assertEqual(self.question.choice_set.get(pk=self.second.pk).votes, 2)
+
+    def test_import_jsonl_resume(self):
+        """An import resumes after the offset kept in the state file."""
+        path = self.write('votes.jsonl', ''.join(
+            f'{{"username": "paper{i}", "choice": {self.first.id}}}\n' for i in range(4)
+        ))
+        state = self.write('state', '2')
+        call_command('import_votes', path, '--state-file', state, stdout=StringIO())
+        self.assertEqual(
+            sorted(Vote.objects.values_list('user__username', flat=True)),
+            ['paper2', 'paper3']
+        )
+        with open(state) as stream:
+            self.assertEqual(stream.read(), '4')
@@ -1,16 +1,18 @@
 import datetime
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from django.shortcuts import reverse
 
 from polls.models import Question
 
+
 def create_question(question_text, days):
     """Create a question with question_text and published date."""
     time = timezone.now() + datetime.timedelta(days=days)
     return Question.objects.create(question_text=question_text, pub_date=time)
 
+
 class QuestionIndexViewTests(TestCase):
     """Test for question in index view."""
 
@@ -55,4 +57,38 @@ class QuestionIndexViewTests(TestCase):
         self.assertQuerysetEqual(
             response.context['latest_question_list'],
             ['<Question: Past question 2.>', '<Question: Past question 1.>']
-        )
\ No newline at end of file
+        )
+
+
+@override_settings(POLLS_INDEX_PAGE_SIZE=2)
+class QuestionIndexPaginationTests(TestCase):
+    """Test for the cursor pagination of the index view."""
+
+    def test_pages_follow_cursor(self):
+        """Following the next cursor walks every question once, latest first."""
+        for days in range(1, 6):
+            create_question(question_text=f'Question {days}.', days=-days)
+        seen = []
+        response = self.client.get(reverse('polls:index'))
+        while True:
+            seen += [q.question_text for q in response.context['latest_question_list']]
+            if not response.context['next_cursor']:
+                break
+            response = self.client.get(reverse('polls:index'), {'cursor': response.context['next_cursor']})
+        self.assertEqual(seen, [f'Question {days}.' for days in range(1, 6)])
+
+    def test_same_pub_date(self):
+        """Questions sharing a pub_date are split across pages by id."""
+        time = timezone.now() - datetime.timedelta(days=1)
+        for i in range(3):
+            Question.objects.create(question_text=f'Same {i}.', pub_date=time)
+        response = self.client.get(reverse('polls:index'))
+        cursor = response.context['next_cursor']
+        response = self.client.get(reverse('polls:index'), {'cursor': cursor})
+        self.assertQuerysetEqual(response.context['latest_question_list'], ['<Question: Same 0.>'])
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_invalid_cursor(self):
+        """An invalid cursor is not found."""
+        response = self.client.get(reverse('polls:index'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,159 @@
+import asyncio
+import datetime
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from mysite.asgi import application
+from polls.models import Question
+from polls import live, results_cache, tallies
+
+
+async def stop_feeds():
+    """Stop the feeds left waiting by a test."""
+    for feed in list(live._feeds.values()):
+        if feed.task:
+            feed.task.cancel()
+            await asyncio.gather(feed.task, return_exceptions=True)
+    live._feeds.clear()
+
+
+@override_settings(POLLS_LIVE_INTERVAL=60, POLLS_LIVE_KEEPALIVE=60)
+class LiveResultsTests(TestCase):
+    """Test for the live results stream."""
+
+    def setUp(self):
+        """Initialize a question with choices."""
+        cache.clear()
+        self.question = Question.objects.create(
+            question_text='Live question',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=30)
+        )
+        self.first = self.question.choice_set.create(choice_text='first')
+        self.second = self.question.choice_set.create(choice_text='second')
+
+    def test_feed_sends_only_changes(self):
+        """After the first results a listener gets only the changed counts."""
+        user = User.objects.create_user(username='live', password='dannysk123')
+
+        async def scenario():
+            feed = live.get_feed(self.question.id)
+            listener = live.Listener()
+            await feed.add(listener)
+            first = await listener.next()
+            self.assertEqual(first, {str(self.first.id): 0, str(self.second.id): 0, 'total': 0})
+            self.assertEqual(await feed.refresh(), {})
+            await stop_feeds()
+
+        async_to_sync(scenario)()
+        tallies.cast_vote(self.question, user, self.second)
+        results_cache.bump_version(self.question.id)
+
+        async def after_vote():
+            feed = live.get_feed(self.question.id)
+            await feed.add(live.Listener())
+            await stop_feeds()
+            return feed
+
+        feed = async_to_sync(after_vote)()
+        self.assertEqual(feed.votes, {str(self.first.id): 0, str(self.second.id): 1})
+
+    def test_feed_is_shared(self):
+        """All listeners of a question share one feed."""
+        self.assertIs(live.get_feed(self.question.id), live.get_feed(self.question.id))
+        live._feeds.clear()
+
+    @override_settings(POLLS_LIVE_INTERVAL=0)
+    def test_deleted_question_closes_listeners(self):
+        """The listeners of a deleted question get no more changes."""
+        question_id = self.question.id
+
+        async def scenario():
+            feed = live.get_feed(question_id)
+            listener = live.Listener()
+            await feed.add(listener)
+            await listener.next()
+            task = feed.task
+            await sync_to_async(self.question.delete)()
+            await sync_to_async(results_cache.bump_version)(question_id)
+            self.assertIsNone(await asyncio.wait_for(listener.next(), 5))
+            await asyncio.wait_for(task, 5)
+            self.assertNotIn(question_id, live._feeds)
+
+        async_to_sync(scenario)()
+
+    @override_settings(POLLS_LIVE_INTERVAL=0)
+    def test_failed_refresh_logged(self):
+        """A failed refresh is logged and the feed keeps running."""
+        async def scenario():
+            feed = live.get_feed(self.question.id)
+            listener = live.Listener()
+            await feed.add(listener)
+            await listener.next()
+            with mock.patch.object(
+                feed, 'refresh', new_callable=mock.AsyncMock,
+                side_effect=[RuntimeError('database is down'), {'total': 1}, {}]
+            ):
+                self.assertEqual(await asyncio.wait_for(listener.next(), 5), {'total': 1})
+            await stop_feeds()
+
+        with self.assertLogs('polls.live', 'ERROR') as logs:
+            async_to_sync(scenario)()
+        self.assertIn(str(self.question.id), logs.records[0].getMessage())
+
+    @override_settings(POLLS_LIVE_RESULTS=True)
+    def test_asgi_stream(self):
+        """The ASGI application streams the results as events."""
+        messages = []
+
+        async def scenario():
+            disconnect = asyncio.Event()
+
+            async def receive():
+                if not messages:
+                    return {'type': 'http.request', 'body': b''}
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                messages.append(message)
+                if message['type'] == 'http.response.body':
+                    disconnect.set()
+
+            scope = {
+                'type': 'http', 'method': 'GET', 'path': f'/polls/{self.question.id}/live/',
+                'headers': [], 'query_string': b'',
+            }
+            await asyncio.wait_for(application(scope, receive, send), 5)
+            await stop_feeds()
+
+        async_to_sync(scenario)()
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), messages[0]['headers'])
+        event = messages[1]['body'].decode()
+        self.assertTrue(event.startswith('data: '))
+        self.assertEqual(json.loads(event[6:])['total'], 0)
+
+    def test_asgi_stream_disabled(self):
+        """Without POLLS_LIVE_RESULTS the live path is left to Django."""
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': f'/polls/{self.question.id}/live/',
+            'headers': [(b'host', b'testserver')], 'query_string': b'',
+        }
+        async_to_sync(application)(scope, receive, send)
+        self.assertEqual(messages[0]['status'], 404)
+        self.assertEqual(live._feeds, {})
@@ -0,0 +1,73 @@
+import datetime
+
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+from django.shortcuts import reverse
+from django.contrib.auth.models import User
+from prometheus_client import REGISTRY
+
+from polls import tallies
+from polls.models import Question
+
+
+def sample(name, **labels):
+    """Return the current value of a metric, zero if it was never set."""
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTests(TestCase):
+    """Test for the Prometheus metrics."""
+
+    def setUp(self):
+        """Initialize logged in user and the question with choices."""
+        self.question = Question.objects.create(
+            question_text='Measured question',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=30)
+        )
+        self.first = self.question.choice_set.create(choice_text='first')
+        self.second = self.question.choice_set.create(choice_text='second')
+        self.user = User.objects.create_user(username='measured', password='dannysk123')
+        self.client.force_login(self.user)
+
+    def test_vote_counters(self):
+        """New and changed votes are counted apart."""
+        cast = sample('polls_votes_total', kind='cast')
+        changed = sample('polls_votes_total', kind='changed')
+        url = reverse('polls:vote', args=(self.question.id,))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'choice': self.first.id})
+            self.client.post(url, {'choice': self.second.id})
+        self.assertEqual(sample('polls_votes_total', kind='cast'), cast + 1)
+        self.assertEqual(sample('polls_votes_total', kind='changed'), changed + 1)
+
+    def test_rolled_back_vote_not_counted(self):
+        """A vote whose transaction rolls back is not counted."""
+        cast = sample('polls_votes_total', kind='cast')
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    tallies.cast_vote(self.question, self.user, self.first)
+                    tallies.cast_votes({(self.question.pk, self.user.pk + 1): self.second.pk})
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(sample('polls_votes_total', kind='cast'), cast)
+
+    def test_request_latency_by_url_name(self):
+        """Request latency is recorded per URL name."""
+        count = sample('polls_request_latency_seconds_count', view='polls:results', method='GET')
+        self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual(
+            sample('polls_request_latency_seconds_count', view='polls:results', method='GET'),
+            count + 1
+        )
+
+    def test_metrics_endpoint(self):
+        """The metrics endpoint answers in the Prometheus text format."""
+        self.client.get(reverse('polls:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'polls_request_latency_seconds_bucket{')
+        self.assertContains(response, 'polls_db_queries_total{view="polls:index"}')
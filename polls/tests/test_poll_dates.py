@@ -5,11 +5,13 @@ from django.utils import timezone
 
 from polls.models import Question
 
+
 def create_question(question_text, days):
     """Create a question with question_text and published date."""
     time = timezone.now() + datetime.timedelta(days=days)
     return Question.objects.create(question_text=question_text, pub_date=time)
 
+
 class QuestionModelTests(TestCase):
     """Class to test question models."""
 
@@ -78,4 +80,36 @@ class QuestionModelTests(TestCase):
                 pub_date=pub_date,
                 end_date=end_date
             )
-        self.assertTrue(recent_question.can_vote())
\ No newline at end of file
+        self.assertTrue(recent_question.can_vote())
+
+
+class QuestionStateQuerySetTests(TestCase):
+    """Test the state of the questions decided by the database."""
+
+    def setUp(self):
+        """Initialize an upcoming, an open and a closed question."""
+        now = timezone.now()
+        self.now = now
+        self.upcoming = Question.objects.create(
+            question_text='Upcoming', pub_date=now + datetime.timedelta(days=1),
+            end_date=now + datetime.timedelta(days=2)
+        )
+        self.open = Question.objects.create(
+            question_text='Open', pub_date=now - datetime.timedelta(days=1), end_date=now
+        )
+        self.closed = Question.objects.create(
+            question_text='Closed', pub_date=now - datetime.timedelta(days=2),
+            end_date=now - datetime.timedelta(seconds=1)
+        )
+
+    def test_filters(self):
+        """Each filter returns the questions in that state."""
+        self.assertQuerysetEqual(Question.objects.upcoming(self.now), [self.upcoming])
+        self.assertQuerysetEqual(Question.objects.open(self.now), [self.open])
+        self.assertQuerysetEqual(Question.objects.closed(self.now), [self.closed])
+
+    def test_with_state(self):
+        """The annotation agrees with can_vote and is_published."""
+        for question in Question.objects.with_state(self.now):
+            self.assertEqual(question.state == 'open', question.pk == self.open.pk)
+            self.assertEqual(question.state == 'upcoming', not question.is_published())
@@ -0,0 +1,154 @@
+import datetime
+import re
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import tallies
+from polls.models import Question, Choice
+
+# A line of the plan that reads a whole table: SQLite shows "SCAN table"
+# without an index, PostgreSQL shows "Seq Scan on table".
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)\s*$|Seq Scan on (\w+)', re.MULTILINE)
+
+# The statements whose plan can read a table.
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE')
+
+
+def explain(sql):
+    """Return the plan of an SQL statement as text."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # The test tables are tiny, so make PostgreSQL show the plan
+            # it would pick for a large table.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+        return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+
+def scanned_tables(plan):
+    """Return the polls tables the plan reads in full."""
+    return [
+        table for match in FULL_SCAN.finditer(plan) for table in match.groups()
+        if table and table.startswith('polls_')
+    ]
+
+
+class QueryPlanTests(TestCase):
+    """Check that the queries of the hot views use an index.
+
+    Each test drives a view with the test client, captures the
+    statements it runs and explains every one of them, so a query added
+    to a view is checked without copying it here.
+    """
+
+    def setUp(self):
+        """Initialize an open and a closed question, their choices and a voter."""
+        now = timezone.now()
+        self.question = Question.objects.create(
+            question_text='What is open?', pub_date=now - datetime.timedelta(days=1),
+            end_date=now + datetime.timedelta(days=1)
+        )
+        self.closed = Question.objects.create(
+            question_text='What is closed?', pub_date=now - datetime.timedelta(days=2),
+            end_date=now - datetime.timedelta(days=1)
+        )
+        self.first = self.question.choice_set.create(choice_text='first')
+        self.second = self.question.choice_set.create(choice_text='second')
+        self.user = User.objects.create_user(username='voter', password='dannysk123')
+        self.client.force_login(self.user)
+
+    def assertUsesIndexes(self, queries):
+        """Fail if one of the captured queries reads a whole polls table."""
+        statements = [
+            query['sql'] for query in queries
+            if query['sql'].lstrip().upper().startswith(EXPLAINED)
+        ]
+        self.assertTrue(statements, 'no query to explain')
+        for sql in statements:
+            plan = explain(sql)
+            self.assertEqual(scanned_tables(plan), [], f'{sql}\n{plan}')
+        return statements
+
+    def assertRequestUsesIndexes(self, method, url, data=None, status=200):
+        """Fail if a statement run by the request reads a whole polls table.
+
+        The cache is cleared first, so the queries the cache saves on
+        later requests are run and checked too.
+        """
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = getattr(self.client, method)(url, data)
+        self.assertEqual(response.status_code, status)
+        return self.assertUsesIndexes(context.captured_queries)
+
+    def test_index_page(self):
+        """The index page, its conditional check and next pages search indexes."""
+        statements = self.assertRequestUsesIndexes('get', reverse('polls:index'))
+        # The Max aggregates of the Last-Modified check.
+        self.assertTrue(any('MAX(' in sql.upper() for sql in statements))
+        with self.settings(POLLS_INDEX_PAGE_SIZE=1):
+            cursor = self.client.get(reverse('polls:index')).context['next_cursor']
+            self.assertRequestUsesIndexes('get', reverse('polls:index'), {'cursor': cursor})
+
+    def test_detail_page(self):
+        """The detail page of open, closed and missing questions uses indexes."""
+        self.assertRequestUsesIndexes('get', reverse('polls:detail', args=(self.question.id,)))
+        self.assertRequestUsesIndexes(
+            'get', reverse('polls:detail', args=(self.closed.id,)), status=302
+        )
+        self.assertRequestUsesIndexes('get', reverse('polls:detail', args=(0,)), status=404)
+
+    def test_results_page(self):
+        """The results page reads the question and its choices through indexes."""
+        self.assertRequestUsesIndexes('get', reverse('polls:results', args=(self.question.id,)))
+
+    def test_vote(self):
+        """Casting and changing a vote writes the tallies through indexes."""
+        url = reverse('polls:vote', args=(self.question.id,))
+        self.assertRequestUsesIndexes('post', url, {'choice': self.first.id}, status=302)
+        self.assertRequestUsesIndexes('post', url, {'choice': self.second.id}, status=302)
+
+    def test_vote_on_sharded_question(self):
+        """Votes on a sharded question move the counter shards through indexes."""
+        Question.objects.filter(pk=self.question.pk).update(counter_shards=4)
+        url = reverse('polls:vote', args=(self.question.id,))
+        self.assertRequestUsesIndexes('post', url, {'choice': self.first.id}, status=302)
+        self.assertRequestUsesIndexes('post', url, {'choice': self.second.id}, status=302)
+
+    def test_vote_without_upsert(self):
+        """The savepoint path of databases without upserts uses indexes too."""
+        url = reverse('polls:vote', args=(self.question.id,))
+        with mock.patch.object(tallies, '_can_upsert', return_value=False):
+            self.assertRequestUsesIndexes('post', url, {'choice': self.first.id}, status=302)
+            self.assertRequestUsesIndexes('post', url, {'choice': self.second.id}, status=302)
+
+    def test_admin_search(self):
+        """The prefix search of the admin uses the question text index."""
+        self.client.force_login(User.objects.create_superuser('admin', password='dannysk123'))
+        self.assertRequestUsesIndexes(
+            'get', reverse('admin:polls_question_changelist'), {'q': 'What'}
+        )
+
+    def test_recount(self):
+        """Recounting the votes of a question reads indexes only."""
+        tallies.cast_vote(self.question, self.user, self.first)
+        with CaptureQueriesContext(connection) as context:
+            call_command('recount_votes', str(self.question.pk), '--check', stdout=StringIO())
+        self.assertUsesIndexes(context.captured_queries)
+
+    def test_full_scan_detected(self):
+        """The check itself notices a query without a usable index."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('plan text differs on this database')
+        plan = Choice.objects.filter(choice_text='x').explain()
+        self.assertEqual(scanned_tables(plan), ['polls_choice'])
@@ -0,0 +1,60 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from django.shortcuts import reverse
+from django.contrib.auth.models import User
+
+from polls.models import Question
+
+
+def create_question(question_text, choices):
+    """Create a published question with the given number of choices."""
+    question = Question.objects.create(
+        question_text=question_text,
+        pub_date=timezone.now(),
+        end_date=timezone.now() + datetime.timedelta(days=30)
+    )
+    for i in range(choices):
+        question.choice_set.create(choice_text=f'choice {i}')
+    return question
+
+
+class ResultsViewTests(TestCase):
+    """Test for the results page."""
+
+    def setUp(self):
+        """Clear the cached results of earlier tests."""
+        cache.clear()
+
+    def test_votes_and_percentage(self):
+        """The results page shows the votes, percentage and total."""
+        question = create_question('Results question', 2)
+        first, second = question.choice_set.order_by('pk')
+        for i in range(3):
+            user = User.objects.create_user(username=f'user{i}', password='dannysk123')
+            self.client.force_login(user)
+            choice = first if i < 2 else second
+            self.client.post(reverse('polls:vote', args=(question.id,)), {'choice': choice.id})
+        self.client.logout()
+        response = self.client.get(reverse('polls:results', args=(question.id,)))
+        self.assertEqual(response.context['total'], 3)
+        self.assertEqual(
+            [(c['votes'], c['percentage']) for c in response.context['choices']],
+            [(2, 66.7), (1, 33.3)]
+        )
+        self.assertContains(response, '3 votes')
+
+    def test_missing_question(self):
+        """The results page of a question that does not exist is not found."""
+        response = self.client.get(reverse('polls:results', args=(404,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_query_count_does_not_grow_with_choices(self):
+        """The results page uses one query whatever the number of choices."""
+        for choices in (1, 5, 20):
+            question = create_question(f'{choices} choices', choices)
+            with self.assertNumQueries(1):
+                response = self.client.get(reverse('polls:results', args=(question.id,)))
+            self.assertEqual(len(response.context['choices']), choices)
@@ -0,0 +1,126 @@
+import datetime
+import tempfile
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.shortcuts import reverse
+from django.contrib.auth.models import User
+
+from polls.models import Question
+from polls import results_cache
+
+
+class ResultsCacheTests(TestCase):
+    """Test for the cache of the results page."""
+
+    def setUp(self):
+        """Initialize an empty cache and a question with choices."""
+        cache.clear()
+        self.question = Question.objects.create(
+            question_text='Cached question',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=30)
+        )
+        self.choice = self.question.choice_set.create(choice_text='cached choice')
+        self.url = reverse('polls:results', args=(self.question.id,))
+
+    def test_results_served_from_cache(self):
+        """A second visit to the results page needs no query."""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['total'], 0)
+        self.assertEqual(results_cache.get_stats()['hits'], 1)
+        self.assertEqual(results_cache.get_stats()['misses'], 1)
+
+    def test_vote_invalidates_results(self):
+        """A committed vote makes the results page show the new tally."""
+        self.client.get(self.url)
+        user = User.objects.create_user(username='voter', password='dannysk123')
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('polls:vote', args=(self.question.id,)),
+                {'choice': self.choice.id}
+            )
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['total'], 1)
+
+    def test_edit_invalidates_results(self):
+        """Editing the question text makes the results page show it."""
+        self.client.get(self.url)
+        self.question.question_text = 'Edited question'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Edited question')
+
+    def test_edit_invalidates_after_commit(self):
+        """The results stay cached until the edit is committed."""
+        self.client.get(self.url)
+        self.question.question_text = 'Edited question'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.question.save()
+            self.assertNotContains(self.client.get(self.url), 'Edited question')
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertContains(self.client.get(self.url), 'Edited question')
+
+    @override_settings(POLLS_RESULTS_CACHE_TIMEOUT=7)
+    def test_local_cache_expires_versions(self):
+        """A per-process cache keeps the versions only as long as the results."""
+        self.assertEqual(results_cache._state_timeout(caches['default']), 7)
+        shared = FileBasedCache(tempfile.gettempdir(), {})
+        self.assertIsNone(results_cache._state_timeout(shared))
+
+
+class OpenQuestionIdsTests(TestCase):
+    """Test for the cached set of open questions."""
+
+    def setUp(self):
+        """Initialize an empty cache and an open question."""
+        cache.clear()
+        self.question = Question.objects.create(
+            question_text='Open question',
+            pub_date=timezone.now() - datetime.timedelta(days=1),
+            end_date=timezone.now() + datetime.timedelta(days=30)
+        )
+
+    def test_cached_without_query(self):
+        """The open ids are read from the cache once computed."""
+        self.assertEqual(results_cache.get_open_ids(), {self.question.pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(results_cache.get_open_ids(), {self.question.pk})
+
+    def test_edit_invalidates_open_ids(self):
+        """Closing a question removes it from the open ids."""
+        results_cache.get_open_ids()
+        self.question.end_date = timezone.now() - datetime.timedelta(seconds=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.save()
+        self.assertEqual(results_cache.get_open_ids(), frozenset())
+
+    def test_expires_at_next_boundary(self):
+        """The cached set is recomputed once a poll reaches its end date."""
+        results_cache.get_open_ids()
+        until = cache.get(results_cache.OPEN_IDS_KEY)['until']
+        self.assertAlmostEqual(until, self.question.end_date.timestamp())
+        entry = cache.get(results_cache.OPEN_IDS_KEY)
+        entry['until'] = 0
+        cache.set(results_cache.OPEN_IDS_KEY, entry)
+        Question.objects.filter(pk=self.question.pk).update(end_date=timezone.now())
+        self.assertEqual(results_cache.get_open_ids(), frozenset())
+
+    def test_detail_gate(self):
+        """The detail page of a poll that left the open ids redirects."""
+        Question.objects.filter(pk=self.question.pk).update(
+            end_date=timezone.now() - datetime.timedelta(days=1)
+        )
+        results_cache.touch_index()
+        user = User.objects.create_user(username='gate', password='dannysk123')
+        self.client.force_login(user)
+        url = reverse('polls:detail', args=(self.question.id,))
+        response = self.client.get(url)
+        self.assertRedirects(response, reverse('polls:index'))
@@ -0,0 +1,27 @@
+from django.db import connections
+from django.test import TestCase, override_settings
+
+
+class SQLitePragmasTest(TestCase):
+    """Test cases for the pragmas of the production database profile."""
+
+    def pragma(self, name):
+        """Return the value of a pragma on a new connection."""
+        connection = connections.create_connection('default')
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA {name}')
+                return cursor.fetchone()[0]
+        finally:
+            connection.close()
+
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -4096, 'busy_timeout': 1234})
+    def test_pragmas_applied(self):
+        """Every new connection gets the configured pragmas."""
+        self.assertEqual(self.pragma('cache_size'), -4096)
+        self.assertEqual(self.pragma('busy_timeout'), 1234)
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_development_profile(self):
+        """Without pragmas a connection keeps the SQLite defaults."""
+        self.assertEqual(self.pragma('cache_size'), -2000)
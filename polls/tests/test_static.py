@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.shortcuts import reverse
+from django.templatetags.static import static
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.utils.functional import empty
+
+
+class StaticFilesTest(TestCase):
+    """Test cases for the self-hosted and hashed static files."""
+
+    def test_no_external_assets(self):
+        """The pages load no CSS or font from another host."""
+        for url in (reverse('polls:index'), reverse('login'), reverse('signup')):
+            content = self.client.get(url).content.decode()
+            self.assertNotIn('https://', content)
+            self.assertIn('/static/polls/vendor/open-sans/open-sans.css', content)
+
+    def test_plain_names_without_manifest(self):
+        """Before collectstatic the files keep their plain names."""
+        self.assertEqual(static('polls/css/style.css'), '/static/polls/css/style.css')
+
+
+class CollectStaticTest(SimpleTestCase):
+    """Test cases for the files written by collectstatic."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Collect the static files into a temporary directory."""
+        super().setUpClass()
+        cls.root = Path(tempfile.mkdtemp())
+        cls.static_root = override_settings(STATIC_ROOT=str(cls.root))
+        cls.static_root.enable()
+        cls.reset_storage()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.reset_storage()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the collected files."""
+        cls.static_root.disable()
+        cls.reset_storage()
+        shutil.rmtree(cls.root)
+        super().tearDownClass()
+
+    @staticmethod
+    def reset_storage():
+        """Make the storage read the current STATIC_ROOT and manifest."""
+        staticfiles_storage._wrapped = empty
+
+    def test_hashed_and_compressed(self):
+        """Every file gets a hashed name and gzip and brotli variants."""
+        url = static('polls/vendor/bootstrap/bootstrap.min.css')
+        self.assertRegex(url, r'/bootstrap\.min\.[0-9a-f]{12}\.css$')
+        path = self.root / url[len('/static/'):]
+        self.assertTrue(path.exists())
+        self.assertTrue(Path(f'{path}.gz').exists())
+        self.assertTrue(Path(f'{path}.br').exists())
+
+    def test_font_references_hashed(self):
+        """The font stylesheet points at the hashed fonts."""
+        css = (self.root / static('polls/vendor/open-sans/open-sans.css')[len('/static/'):]).read_text()
+        self.assertRegex(css, r'url\("open-sans-400\.[0-9a-f]{12}\.woff2"\)')
+
+    def test_immutable_headers(self):
+        """Hashed files are served with far-future immutable headers."""
+        response = Client().get(static('polls/css/style.css'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=315360000', response['Cache-Control'])
+        response.close()
@@ -0,0 +1,75 @@
+import datetime
+import json
+
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.utils import timezone
+from django.shortcuts import reverse
+
+from mysite.middleware import QueryStatsMiddleware
+from polls.models import Question
+
+
+def repeat_view(request):
+    """Load every question one by one, like an N+1 loop does."""
+    for pk in Question.objects.values_list('pk', flat=True):
+        Question.objects.get(pk=pk)
+    return HttpResponse()
+
+
+urlpatterns = [path('repeat/', repeat_view)]
+
+
+class RequestTimingTests(TestCase):
+    """Test for the request timing middleware."""
+
+    def setUp(self):
+        """Initialize a published question."""
+        self.question = Question.objects.create(
+            question_text='Timed question',
+            pub_date=timezone.now() - datetime.timedelta(days=1),
+            end_date=timezone.now() + datetime.timedelta(days=1)
+        )
+
+    def test_server_timing_header(self):
+        """Responses carry the database, template and total time."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('polls:index'))
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    @override_settings(REQUEST_TIMING_SLOW_MS=0)
+    def test_slow_request_logged(self):
+        """A request over the threshold is logged as a warning."""
+        with self.assertLogs('mysite.timing', 'WARNING') as logs:
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('polls:index'))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertTrue(line['slow'])
+        self.assertEqual(line['view'], 'polls:index')
+        self.assertEqual(line['queries'], len(queries))
+
+    @override_settings(REQUEST_TIMING_REPEATED_QUERIES=2)
+    def test_repeated_queries_logged(self):
+        """The same SQL run again and again is reported."""
+        for i in range(3):
+            Question.objects.create(question_text=f'Repeat {i}', pub_date=timezone.now())
+        with self.assertLogs('mysite.timing', 'WARNING') as logs:
+            with self.settings(ROOT_URLCONF=__name__):
+                self.client.get('/repeat/')
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(list(line['repeated_queries'].values()), [4])
+
+    def test_report_required(self):
+        """A query stats middleware without report() cannot be created."""
+        class NoReport(QueryStatsMiddleware):
+            pass
+
+        with self.assertRaises(TypeError):
+            NoReport(lambda request: HttpResponse())
@@ -0,0 +1,159 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from polls import tallies
+from polls.models import Question, Vote, VoteBucket
+
+
+class VoteHistoryTests(TestCase):
+    """Test for the timestamps and minute buckets of the votes."""
+
+    def setUp(self):
+        """Initialize a question with two choices and a voter."""
+        self.question = Question.objects.create(
+            question_text='Trend question',
+            pub_date=timezone.now() - datetime.timedelta(days=1),
+            end_date=timezone.now() + datetime.timedelta(days=1)
+        )
+        self.first = self.question.choice_set.create(choice_text='first')
+        self.second = self.question.choice_set.create(choice_text='second')
+        self.user = User.objects.create_user(username='trend', password='dannysk123')
+
+    def buckets(self):
+        """Return the net votes of every bucket, by choice."""
+        return dict(VoteBucket.objects.values_list('choice_id', 'count'))
+
+    def test_vote_records_time(self):
+        """A vote records when it was cast and moves its minute bucket."""
+        before = timezone.now()
+        tallies.cast_vote(self.question, self.user, self.first)
+        vote = Vote.objects.get(user=self.user)
+        self.assertGreaterEqual(vote.voted_at, before)
+        bucket = VoteBucket.objects.get()
+        self.assertEqual(bucket.minute, vote.voted_at.replace(second=0, microsecond=0))
+        self.assertEqual(self.buckets(), {self.first.pk: 1})
+
+    def test_changed_vote(self):
+        """A changed vote moves the time and both buckets."""
+        tallies.cast_vote(self.question, self.user, self.first)
+        first_time = Vote.objects.get(user=self.user).voted_at
+        tallies.cast_vote(self.question, self.user, self.second)
+        self.assertGreaterEqual(Vote.objects.get(user=self.user).voted_at, first_time)
+        self.assertEqual(self.buckets(), {self.first.pk: 0, self.second.pk: 1})
+
+    def test_buffered_votes(self):
+        """Votes written in a batch move the buckets by their net change."""
+        other = User.objects.create_user(username='other', password='dannysk123')
+        tallies.cast_votes({
+            (self.question.pk, self.user.pk): self.first.pk,
+            (self.question.pk, other.pk): self.first.pk,
+        })
+        self.assertEqual(self.buckets(), {self.first.pk: 2})
+
+    def test_vote_without_time(self):
+        """Votes from before the times were recorded have no time."""
+        vote = Vote.objects.create(
+            question=self.question, user=self.user, choice=self.first, voted_at=None
+        )
+        self.assertIsNone(Vote.objects.get(pk=vote.pk).voted_at)
+
+
+class TrendAPITests(TestCase):
+    """Test for the JSON API of the votes of a question over time."""
+
+    def setUp(self):
+        """Initialize a question with votes two and five hours ago."""
+        now = timezone.now()
+        self.question = Question.objects.create(
+            question_text='Trend question',
+            pub_date=now - datetime.timedelta(days=3),
+            end_date=now + datetime.timedelta(days=1)
+        )
+        self.first = self.question.choice_set.create(choice_text='first')
+        self.second = self.question.choice_set.create(choice_text='second')
+        # A vote from before the history was recorded, only in the tallies.
+        tallies.record_vote(self.question.pk, self.first.pk)
+        VoteBucket.objects.all().delete()
+        self.hour = now.replace(minute=0, second=0, microsecond=0)
+        for hours_ago, choice, previous in [
+            (5, self.first, None), (5, self.second, None),
+            (2, self.second, None), (2, self.second, self.first),
+        ]:
+            tallies.record_vote(
+                self.question.pk, choice.pk, previous and previous.pk,
+                voted_at=self.hour - datetime.timedelta(hours=hours_ago, minutes=-1)
+            )
+        self.url = reverse('polls:api_trend', args=(self.question.id,))
+
+    def get(self, status=200, **params):
+        """Return the decoded JSON of the API."""
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def test_hourly_points(self):
+        """Each hour with votes has its net votes and the totals after it."""
+        data = self.get(resolution='hour')
+        self.assertEqual([c['votes'] for c in data['choices']], [1, 3])
+        first, second = str(self.first.pk), str(self.second.pk)
+        self.assertEqual(len(data['points']), 2)
+        self.assertEqual(data['points'][0]['votes'], {first: 1, second: 1})
+        self.assertEqual(data['points'][0]['totals'], {first: 2, second: 1})
+        self.assertEqual(data['points'][1]['votes'], {first: -1, second: 2})
+        self.assertEqual(data['points'][1]['totals'], {first: 1, second: 3})
+        self.assertEqual(data['points'][1]['total'], 4)
+
+    def test_range_start(self):
+        """The totals of a range start from the votes before it."""
+        since = (self.hour - datetime.timedelta(hours=3)).isoformat()
+        data = self.get(resolution='minute', since=since)
+        self.assertEqual(len(data['points']), 1)
+        self.assertEqual(
+            data['points'][0]['totals'], {str(self.first.pk): 1, str(self.second.pk): 3}
+        )
+
+    def test_range_end(self):
+        """Periods after the range are left out and its totals count without them."""
+        until = (self.hour - datetime.timedelta(hours=3)).isoformat()
+        data = self.get(resolution='hour', until=until, since=(
+            self.hour - datetime.timedelta(hours=6)
+        ).isoformat())
+        self.assertEqual(len(data['points']), 1)
+        self.assertEqual(
+            data['points'][0]['totals'], {str(self.first.pk): 2, str(self.second.pk): 1}
+        )
+
+    def test_daily_rollup(self):
+        """Coarser resolutions add up the minute buckets."""
+        data = self.get(resolution='day')
+        self.assertEqual(data['points'][-1]['total'], 4)
+
+    def test_queries_do_not_grow_with_votes(self):
+        """A trend costs the same queries however many votes there are."""
+        with self.assertNumQueries(3):
+            self.get()
+        for minutes in range(50):
+            tallies.record_vote(
+                self.question.pk, self.first.pk,
+                voted_at=self.hour - datetime.timedelta(minutes=minutes)
+            )
+        with self.assertNumQueries(3):
+            self.get()
+
+    @override_settings(POLLS_TREND_MAX_POINTS=10)
+    def test_too_many_points(self):
+        """A range with too many periods is refused."""
+        self.get(status=400, resolution='minute')
+
+    def test_invalid_parameters(self):
+        """Unknown resolutions, bad times and hidden questions are refused."""
+        self.get(status=400, resolution='week')
+        self.get(status=400, since='yesterday')
+        Question.objects.filter(pk=self.question.pk).update(
+            pub_date=timezone.now() + datetime.timedelta(days=1)
+        )
+        self.get(status=404)
@@ -0,0 +1,126 @@
+import datetime
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.shortcuts import reverse
+from django.contrib.auth.models import User
+
+from polls.models import Question, Vote
+from polls import tallies, vote_buffer
+from polls.vote_buffer import VoteBuffer
+
+
+class VoteBufferTest(TestCase):
+    """Test cases for the write-behind vote buffer."""
+
+    def setUp(self):
+        """Initialize users and the question with choices."""
+        self.question = Question.objects.create(
+            question_text='Buffered question',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=30)
+        )
+        self.first = self.question.choice_set.create(choice_text='first')
+        self.second = self.question.choice_set.create(choice_text='second')
+        self.users = [
+            User.objects.create_user(username=f'buffer{i}', password='dannysk123')
+            for i in range(3)
+        ]
+
+    def assertCounts(self, first, second):
+        """Check the stored tallies of both choices and the question."""
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual((self.first.votes, self.second.votes), (first, second))
+        self.assertEqual(self.question.vote_count, first + second)
+
+    def test_flush_on_size(self):
+        """The buffer writes its votes once it holds enough of them."""
+        buffer = VoteBuffer(size=2, interval=60)
+        buffer.add(self.question.id, self.users[0].id, self.first.id)
+        self.assertFalse(Vote.objects.exists())
+        buffer.add(self.question.id, self.users[1].id, self.second.id)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(Vote.objects.count(), 2)
+        self.assertCounts(1, 1)
+
+    def test_last_write_wins(self):
+        """Only the latest pending vote of a user is written."""
+        buffer = VoteBuffer(size=10, interval=60)
+        buffer.add(self.question.id, self.users[0].id, self.first.id)
+        buffer.add(self.question.id, self.users[0].id, self.second.id)
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(Vote.objects.get().choice, self.second)
+        self.assertCounts(0, 1)
+
+    def test_flush_moves_existing_votes(self):
+        """A buffered vote replaces the vote the user already has."""
+        buffer = VoteBuffer(size=10, interval=60)
+        buffer.add(self.question.id, self.users[0].id, self.first.id)
+        buffer.add(self.question.id, self.users[1].id, self.first.id)
+        buffer.flush()
+        buffer.add(self.question.id, self.users[0].id, self.second.id)
+        buffer.add(self.question.id, self.users[2].id, self.second.id)
+        buffer.flush()
+        self.assertEqual(Vote.objects.count(), 3)
+        self.assertCounts(1, 2)
+
+    @override_settings(POLLS_VOTE_MODE='buffered', POLLS_VOTE_BUFFER_SIZE=10, POLLS_VOTE_BUFFER_INTERVAL=60)
+    def test_buffered_vote_view(self):
+        """In buffered mode the vote view queues the vote and redirects."""
+        vote_buffer._buffer = None
+        self.client.force_login(self.users[0])
+        response = self.client.post(
+            reverse('polls:vote', args=(self.question.id,)), {'choice': self.first.id}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Vote.objects.exists())
+        vote_buffer.get_buffer().flush()
+        self.assertCounts(1, 0)
+        vote_buffer._buffer = None
+
+
+class VoteBufferFailureTest(TransactionTestCase):
+    """Test cases for buffered votes that cannot be written."""
+
+    def setUp(self):
+        """Initialize users and the question with a choice."""
+        self.question = Question.objects.create(
+            question_text='Buffered question',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=30)
+        )
+        self.choice = self.question.choice_set.create(choice_text='first')
+        self.users = [
+            User.objects.create_user(username=f'buffer{i}', password='dannysk123')
+            for i in range(3)
+        ]
+
+    def test_deleted_user_is_dropped(self):
+        """A vote of a deleted user is dropped and the other votes are written."""
+        buffer = VoteBuffer(size=3, interval=60)
+        buffer.add(self.question.id, self.users[0].id, self.choice.id)
+        buffer.add(self.question.id, self.users[1].id, self.choice.id)
+        self.users[1].delete()
+        with self.assertLogs('polls.vote_buffer', 'ERROR'):
+            buffer.add(self.question.id, self.users[2].id, self.choice.id)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(
+            set(Vote.objects.values_list('user_id', flat=True)),
+            {self.users[0].id, self.users[2].id}
+        )
+        self.assertEqual(Question.objects.get().vote_count, 2)
+
+    def test_unreachable_database_keeps_batch(self):
+        """When the database fails the batch goes back into the buffer."""
+        buffer = VoteBuffer(size=2, interval=60)
+        buffer.add(self.question.id, self.users[0].id, self.choice.id)
+        with mock.patch.object(tallies, 'cast_votes', side_effect=OperationalError):
+            with self.assertLogs('polls.vote_buffer', 'ERROR'):
+                buffer.add(self.question.id, self.users[1].id, self.choice.id)
+        self.assertEqual(len(buffer), 2)
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(Vote.objects.count(), 2)
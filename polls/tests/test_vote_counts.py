@@ -0,0 +1,246 @@
+import datetime
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from django.shortcuts import reverse
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from polls import tallies
+from polls.models import Question, Choice, ChoiceCounterShard, Vote
+
+
+class VoteCountTest(TestCase):
+    """Test cases for the stored vote tallies."""
+
+    def setUp(self):
+        """Initialize logged in user and the question with choices."""
+        self.question = Question.objects.create(
+            question_text='Test question',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=30)
+        )
+        self.first = self.question.choice_set.create(choice_text='first')
+        self.second = self.question.choice_set.create(choice_text='second')
+        self.user = User.objects.create_user(username='voter', password='dannysk123')
+        self.client.force_login(self.user)
+        self.url = reverse('polls:vote', args=(self.question.id,))
+
+    def assertCounts(self, first, second):
+        """Check the stored tallies of both choices and the question."""
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual(self.first.votes, first)
+        self.assertEqual(self.second.votes, second)
+        self.assertEqual(self.question.vote_count, first + second)
+
+    def test_vote_increases_count(self):
+        """A new vote increases the choice and question tallies."""
+        self.client.post(self.url, {'choice': self.first.id})
+        self.assertCounts(1, 0)
+
+    def test_changed_vote_moves_count(self):
+        """Changing a vote moves one count from the old to the new choice."""
+        self.client.post(self.url, {'choice': self.first.id})
+        self.client.post(self.url, {'choice': self.second.id})
+        self.assertCounts(0, 1)
+
+    def test_same_vote_twice(self):
+        """Voting again for the same choice does not change the tallies."""
+        self.client.post(self.url, {'choice': self.first.id})
+        self.client.post(self.url, {'choice': self.first.id})
+        self.assertCounts(1, 0)
+
+    @skipUnless(tallies._can_upsert(connection), 'database has no INSERT ... ON CONFLICT ... RETURNING')
+    def test_cast_vote_upserts(self):
+        """Casting a vote takes one statement per row it writes."""
+        # A savepoint, the vote, the choice, its bucket and the question.
+        with self.assertNumQueries(6):
+            self.assertIsNone(tallies.cast_vote(self.question, self.user, self.first))
+        # The vote update and the other choice and bucket come on top.
+        with self.assertNumQueries(8):
+            self.assertEqual(tallies.cast_vote(self.question, self.user, self.second), self.first.pk)
+        with self.assertNumQueries(3):
+            self.assertEqual(tallies.cast_vote(self.question, self.user, self.second), self.second.pk)
+        self.assertCounts(0, 1)
+        self.assertEqual(Vote.objects.get(user=self.user).choice, self.second)
+
+    def test_cast_vote_without_upsert(self):
+        """Databases without upserts insert in a savepoint and update on conflict."""
+        with mock.patch.object(tallies, '_can_upsert', return_value=False):
+            self.assertIsNone(tallies.cast_vote(self.question, self.user, self.first))
+            self.assertEqual(tallies.cast_vote(self.question, self.user, self.second), self.first.pk)
+            self.assertEqual(tallies.cast_vote(self.question, self.user, self.second), self.second.pk)
+        self.assertCounts(0, 1)
+
+    def test_recount_command(self):
+        """The recount command reports and fixes wrong tallies."""
+        Vote.objects.create(question=self.question, choice=self.second, user=self.user)
+        with self.assertRaises(CommandError):
+            call_command('recount_votes', '--check', stdout=StringIO())
+        call_command('recount_votes', stdout=StringIO())
+        self.assertCounts(0, 1)
+        call_command('recount_votes', '--check', stdout=StringIO())
+
+    def test_votes_property_has_no_query(self):
+        """Reading the votes of a choice does not query the database."""
+        choice = Choice.objects.get(pk=self.first.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(choice.votes, 0)
+
+
+class ShardedCounterTest(TestCase):
+    """Test cases for the tallies of a question with counter shards."""
+
+    def setUp(self):
+        """Initialize an empty cache, a question with four counter shards and voters."""
+        cache.clear()
+        self.question = Question.objects.create(
+            question_text='Sharded question',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=30),
+            counter_shards=4
+        )
+        self.first = self.question.choice_set.create(choice_text='first')
+        self.second = self.question.choice_set.create(choice_text='second')
+        self.users = [
+            User.objects.create_user(username=f'sharded{i}', password='dannysk123')
+            for i in range(6)
+        ]
+
+    def vote(self, user, choice):
+        """Vote for the choice as the user."""
+        self.client.force_login(user)
+        self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': choice.id})
+
+    def test_votes_spread_over_shards(self):
+        """Votes move the shards and leave the stored tallies alone."""
+        for user in self.users:
+            self.vote(user, self.first)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.vote_count, 0)
+        self.assertEqual(self.first.votes, 6)
+        self.assertEqual(self.first.shards.count(), 4)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.vote_count, 0)
+
+    def test_changed_vote(self):
+        """Changing a vote moves one count between the shards of the choices."""
+        self.vote(self.users[0], self.first)
+        self.vote(self.users[0], self.second)
+        self.assertEqual(
+            [choice.votes for choice in self.question.choice_set.order_by('pk')], [0, 1]
+        )
+
+    def test_unshard_then_change_vote(self):
+        """A vote counted in a shard can change once the question is unsharded."""
+        for user in self.users[:2]:
+            self.vote(user, self.first)
+        tallies.fold_shards([self.question.pk])
+        Question.objects.filter(pk=self.question.pk).update(counter_shards=1)
+        self.vote(self.users[0], self.second)
+        self.assertFalse(ChoiceCounterShard.objects.exists())
+        self.assertEqual(
+            list(self.question.choice_set.order_by('pk').values_list('vote_count', flat=True)),
+            [1, 1]
+        )
+        self.assertEqual(tallies.find_mismatches(), [])
+
+    def test_change_vote_of_unfolded_shard(self):
+        """A vote still counted in a shard changes without a negative vote_count."""
+        self.vote(self.users[0], self.first)
+        Question.objects.filter(pk=self.question.pk).update(counter_shards=1)
+        self.vote(self.users[0], self.second)
+        self.assertEqual(
+            [choice.votes for choice in self.question.choice_set.order_by('pk')], [0, 1]
+        )
+        self.assertEqual(tallies.find_mismatches(), [])
+
+    def test_admin_folds_shards(self):
+        """Changing the shards of a question in the admin folds its shards."""
+        for user in self.users[:3]:
+            self.vote(user, self.first)
+        admin = User.objects.create_superuser(username='admin', password='dannysk123')
+        self.client.force_login(admin)
+        pub_date = timezone.localtime(self.question.pub_date)
+        end_date = timezone.localtime(self.question.end_date)
+        data = {
+            'question_text': self.question.question_text,
+            'counter_shards': 1,
+            'pub_date_0': pub_date.strftime('%Y-%m-%d'),
+            'pub_date_1': pub_date.strftime('%H:%M:%S'),
+            'end_date_0': end_date.strftime('%Y-%m-%d'),
+            'end_date_1': end_date.strftime('%H:%M:%S'),
+            'choice_set-TOTAL_FORMS': 2,
+            'choice_set-INITIAL_FORMS': 2,
+            'choice_set-MIN_NUM_FORMS': 0,
+            'choice_set-MAX_NUM_FORMS': 1000,
+        }
+        for i, choice in enumerate((self.first, self.second)):
+            data.update({
+                f'choice_set-{i}-id': choice.pk,
+                f'choice_set-{i}-question': self.question.pk,
+                f'choice_set-{i}-choice_text': choice.choice_text,
+                f'choice_set-{i}-vote_count': 0,
+            })
+        response = self.client.post(
+            reverse('admin:polls_question_change', args=(self.question.pk,)), data
+        )
+        self.assertEqual(response.status_code, 302)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.vote_count, 3)
+        self.assertFalse(ChoiceCounterShard.objects.exists())
+        self.assertEqual(tallies.find_mismatches(), [])
+
+    def test_buffered_change_moves_shards(self):
+        """Votes written in a batch move the same shards as single votes."""
+        tallies.cast_votes({(self.question.pk, user.pk): self.first.pk for user in self.users})
+        tallies.cast_votes({(self.question.pk, self.users[1].pk): self.second.pk})
+        self.first.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual((self.first.vote_count, self.first.votes), (0, 5))
+        self.assertEqual(self.question.vote_count, 0)
+        shard = self.users[1].pk % 4
+        self.assertEqual(
+            ChoiceCounterShard.objects.get(choice=self.second, shard=shard).count, 1
+        )
+        self.assertEqual(tallies.find_mismatches(), [])
+
+    def test_imported_change_on_sharded_poll(self):
+        """A batch changing votes cast one by one keeps the tallies consistent."""
+        self.vote(self.users[0], self.first)
+        tallies.cast_votes({(self.question.pk, self.users[0].pk): self.second.pk})
+        self.assertEqual(
+            [choice.votes for choice in self.question.choice_set.order_by('pk')], [0, 1]
+        )
+        self.assertEqual(tallies.find_mismatches(), [])
+
+    def test_results_sum_shards(self):
+        """The results, the API and the recount see the sharded votes."""
+        Choice.objects.filter(pk=self.first.pk).update(vote_count=1)
+        Question.objects.filter(pk=self.question.pk).update(vote_count=1)
+        Vote.objects.create(question=self.question, choice=self.first, user=self.users[5])
+        for user in self.users[:3]:
+            self.vote(user, self.second)
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual(response.context['total'], 4)
+        self.assertEqual([c['votes'] for c in response.context['choices']], [1, 3])
+        response = self.client.get(reverse('polls:api_questions'), {'ids': self.question.id})
+        self.assertEqual(response.json()['questions'][0]['total'], 4)
+        call_command('recount_votes', '--check', stdout=StringIO())
+
+    def test_recount_folds_wrong_shards(self):
+        """Recounting a wrong sharded choice moves its tally back to vote_count."""
+        for user in self.users[:2]:
+            self.vote(user, self.first)
+        Vote.objects.filter(user=self.users[0]).delete()
+        call_command('recount_votes', stdout=StringIO())
+        self.first.refresh_from_db()
+        self.assertEqual((self.first.vote_count, self.first.votes), (1, 1))
+        call_command('recount_votes', '--check', stdout=StringIO())
@@ -1,11 +1,13 @@
 import datetime
 
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from django.utils import timezone
 from django.shortcuts import reverse
 from django.contrib.auth.models import User
 
-from polls.models import Question
+from polls.models import Question, Vote
+from polls import tallies
 
 class VotingTest(TestCase):
     """Test cases for voting the polls."""
@@ -47,3 +49,32 @@ class VotingTest(TestCase):
         url = reverse('polls:vote', args=(self.question.id,))
         response = self.client.post(url, {'choice': 4})
         self.assertEqual(response.status_code, 302)
+
+
+class UniqueVoteTest(TestCase):
+    """Test cases for the one vote per user per question guarantee."""
+
+    def setUp(self):
+        """Initialize a user and the question with choices."""
+        self.question = Question.objects.create(
+            question_text='Unique question',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=30)
+        )
+        self.first = self.question.choice_set.create(choice_text='first')
+        self.second = self.question.choice_set.create(choice_text='second')
+        self.user = User.objects.create_user(username='unique', password='dannysk123')
+
+    def test_duplicate_vote_rejected(self):
+        """The database refuses a second vote row for the same user."""
+        Vote.objects.create(question=self.question, user=self.user, choice=self.first)
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Vote.objects.create(question=self.question, user=self.user, choice=self.second)
+
+    def test_cast_vote_keeps_one_row(self):
+        """Casting votes again updates the single vote of the user."""
+        self.assertIsNone(tallies.cast_vote(self.question, self.user, self.first))
+        self.assertEqual(tallies.cast_vote(self.question, self.user, self.second), self.first.id)
+        self.assertEqual(self.question.vote_set.filter(user=self.user).count(), 1)
+        self.assertEqual(self.question.vote_set.get(user=self.user).choice, self.second)
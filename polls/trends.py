@@ -0,0 +1,107 @@
+"""History of the votes of a poll, read from the per-minute vote buckets.
+
+polls.tallies moves the VoteBucket of a choice for the minute of every
+vote, so the votes of a question over time are the sums of its buckets
+grouped by minute, hour or day.  Reading a range never depends on the
+number of votes, but it reads every bucket of the question from the
+start of the range up to now: the totals at the start are recovered
+from the current tallies less the buckets since then.  A range that
+ends now, the default, reads only the buckets in the range; one that
+ended long ago also sums all the buckets after it.
+"""
+import datetime
+
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+
+from .models import Choice, VoteBucket
+
+RESOLUTIONS = {
+    'minute': datetime.timedelta(minutes=1),
+    'hour': datetime.timedelta(hours=1),
+    'day': datetime.timedelta(days=1),
+}
+
+# Range returned when the caller gives no start, per resolution.
+DEFAULT_WINDOWS = {
+    'minute': datetime.timedelta(hours=1),
+    'hour': datetime.timedelta(days=2),
+    'day': datetime.timedelta(days=30),
+}
+
+
+def align(moment, resolution):
+    """Return the start of the period of a resolution a datetime falls in.
+
+    Hours and days start in the current time zone, as the periods of
+    question_trend() do.
+    """
+    moment = timezone.localtime(moment).replace(second=0, microsecond=0)
+    if resolution in ('hour', 'day'):
+        moment = moment.replace(minute=0)
+    if resolution == 'day':
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def question_trend(question, resolution, since, until):
+    """Collect the votes of a question per period between two times.
+
+    Votes cast before the buckets existed are only in the tallies, so
+    the totals at the start of the range are the current votes less the
+    buckets since then: those in the range, and those after it, summed
+    by the database with the choices.  Loading the choices therefore
+    reads every bucket of the question from ``until`` to now.
+
+    Args:
+        question: the Question
+        resolution: 'minute', 'hour' or 'day', the length of a period
+        since: start of the range, included, see align()
+        until: end of the range, excluded
+
+    Returns:
+        dict: the choices with their current votes, and one point per
+            period that had votes, with the net votes of each choice in
+            the period and the totals at its end; choices are keyed by id
+    """
+    after = (
+        VoteBucket.objects.filter(choice=OuterRef('pk'), minute__gte=until).order_by()
+        .values('choice').annotate(total=Sum('count')).values('total')
+    )
+    choices = list(
+        Choice.objects.filter(question=question)
+        .annotate(votes_after=Coalesce(Subquery(after), 0)).order_by('pk')
+    )
+    rows = (
+        VoteBucket.objects.filter(question=question, minute__gte=since, minute__lt=until)
+        .annotate(period=Trunc('minute', resolution)).values('period', 'choice_id')
+        .annotate(votes=Sum('count')).order_by('period', 'choice_id')
+    )
+    later = {choice.pk: choice.votes_after for choice in choices}
+    periods = {}
+    for row in rows:
+        later[row['choice_id']] = later.get(row['choice_id'], 0) + row['votes']
+        periods.setdefault(row['period'], {})[row['choice_id']] = row['votes']
+    totals = {choice.pk: choice.votes - later[choice.pk] for choice in choices}
+    points = []
+    for period, votes in periods.items():
+        for choice_id, count in votes.items():
+            totals[choice_id] = totals.get(choice_id, 0) + count
+        points.append({
+            'time': period,
+            'votes': votes,
+            'totals': dict(totals),
+            'total': sum(totals.values()),
+        })
+    return {
+        'question': {'id': question.pk, 'question_text': question.question_text},
+        'resolution': resolution,
+        'since': since,
+        'until': until,
+        'choices': [
+            {'id': choice.pk, 'choice_text': choice.choice_text, 'votes': choice.votes}
+            for choice in choices
+        ],
+        'points': points,
+    }
@@ -1,12 +1,28 @@
 """The urls to link to each page of polls application."""
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import api, views
+
+
+def build_urlpatterns(view_mode):
+    """Return the polls urls, with the async pages when view_mode is 'async'."""
+    if view_mode == 'async':
+        from . import async_views
+        detail, results, vote = async_views.detail, async_views.results, async_views.vote
+    else:
+        detail, results, vote = views.detail, views.ResultsView.as_view(), views.vote
+    return [
+        path('', views.IndexView.as_view(), name='index'),
+        path('<int:question_id>/', detail, name='detail'),
+        path('<int:pk>/results/', results, name='results'),
+        path('<int:question_id>/vote/', vote, name='vote'),
+        path('export/results.<slug:file_format>', views.export_results, name='export_results'),
+        path('export/votes.<slug:file_format>', views.export_votes, name='export_votes'),
+        path('api/questions', api.questions, name='api_questions'),
+        path('api/questions/<int:question_id>/trend', api.trend, name='api_trend'),
+    ]
+
 
 app_name = 'polls'
-urlpatterns = [
-    path('', views.IndexView.as_view(), name='index'),
-    path('<int:question_id>/', views.detail, name='detail'),
-    path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),
-    path('<int:question_id>/vote/', views.vote, name='vote')
-]
+urlpatterns = build_urlpatterns(settings.POLLS_VIEW_MODE)
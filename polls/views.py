@@ -1,46 +1,162 @@
 """Views to render templates for Poll application."""
-from django.http import HttpResponseRedirect
-from django.shortcuts import render, get_object_or_404, redirect
+from django.conf import settings
+from django.db.models import Max, Q
+from django.http import HttpResponseRedirect, Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
 from django.urls import reverse
 from django.views import generic
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.decorators import method_decorator
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 
 from .models import Question, Choice, Vote
+from . import tallies, results_cache, vote_buffer, export
 
 
+def _index_changed(request):
+    """Return when the index last changed.
+
+    That is the latest of the last pub_date or end_date that has passed
+    and the last time a question was added, edited or deleted.
+    """
+    if not hasattr(request, 'index_changed'):
+        now = timezone.now()
+        boundaries = [
+            Question.objects.filter(pub_date__lte=now).aggregate(last=Max('pub_date'))['last'],
+            Question.objects.filter(end_date__lte=now).aggregate(last=Max('end_date'))['last'],
+            results_cache.get_index_changed(),
+        ]
+        request.index_changed = max(boundary for boundary in boundaries if boundary)
+    return request.index_changed
+
+
+def index_last_modified(request, *args, **kwargs):
+    """Return the Last-Modified time of the index page."""
+    return _index_changed(request)
+
+
+def index_etag(request, *args, **kwargs):
+    """Return the ETag of the index page as seen by the current user."""
+    return '{}-{}-{}-{}'.format(
+        _index_changed(request).timestamp(), request.user.pk,
+        request.GET.get('cursor', ''), settings.POLLS_INDEX_PAGE_SIZE
+    )
+
+
+def results_etag(request, pk, *args, **kwargs):
+    """Return the ETag of the results page, its results version.
+
+    There is none until the results are cached, so requests for
+    questions that do not exist create no version.
+    """
+    version = results_cache.peek_version(pk)
+    return None if version is None else f'{pk}-{version}'
+
+
+@method_decorator(cache_control(private=True, no_cache=True), name='dispatch')
+@method_decorator(vary_on_cookie, name='dispatch')
+@method_decorator(condition(etag_func=index_etag, last_modified_func=index_last_modified), name='dispatch')
 class IndexView(generic.ListView):
-    """Index page represent the latest question."""
+    """Index page represent the published questions, latest first.
+
+    The page after the current one is reached with an opaque cursor
+    made from the pub_date and id of the last question shown, so every
+    page is a single index range scan however far back it is.
+    """
 
     template_name = 'polls/index.html'
     context_object_name = 'latest_question_list'
 
     def get_queryset(self):
-        """Return the last five published questions."""
-        return Question.objects.filter(
+        """Return one page of published questions."""
+        page_size = settings.POLLS_INDEX_PAGE_SIZE
+        questions = Question.objects.filter(
             pub_date__lte=timezone.now()
-        ).order_by('-pub_date')[:5]
+        ).order_by('-pub_date', '-pk')
+        cursor = self.request.GET.get('cursor')
+        if cursor:
+            try:
+                pub_date, pk = decode_cursor(cursor)
+            except ValueError:
+                raise Http404('Invalid page cursor')
+            questions = questions.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+            )
+        page = list(questions[:page_size + 1])
+        self.next_cursor = encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+        return page[:page_size]
+
+    def get_context_data(self, **kwargs):
+        """Add the cursors of the next page and of the current page."""
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        context['cursor'] = self.request.GET.get('cursor')
+        context['open_question_ids'] = results_cache.get_open_ids()
+        return context
+
+
+def encode_cursor(question):
+    """Return the page cursor pointing after the question."""
+    value = f'{question.pub_date.isoformat()}|{question.pk}'
+    return urlsafe_base64_encode(value.encode())
+
+
+def decode_cursor(cursor):
+    """Return the pub_date and id a page cursor points after.
+
+    Raises:
+        ValueError: if the cursor is not valid
+    """
+    try:
+        pub_date, pk = urlsafe_base64_decode(cursor).decode().split('|')
+    except (TypeError, UnicodeDecodeError):
+        raise ValueError(cursor)
+    pub_date = parse_datetime(pub_date)
+    if pub_date is None:
+        raise ValueError(cursor)
+    return pub_date, int(pk)
+
 
 def detail(request, question_id):
     """Question detail page represent the question text and choice to vote."""
-    question = get_object_or_404(Question, pk=question_id)
-    if not question.can_vote():
+    if question_id not in results_cache.get_open_ids():
+        if not Question.objects.filter(pk=question_id).exists():
+            raise Http404('No question found matching the query')
         messages.error(request, 'Voting is not allowed!')
         return redirect('polls:index')
+    question = get_object_or_404(Question, pk=question_id)
     try:
         prev_choice = question.vote_set.get(user=request.user).choice
     except (KeyError, Vote.DoesNotExist):
-        return render(request, 'polls/detail.html', {'question': question})
-    return render(request, 'polls/detail.html', {'question': question, 'previous_choice': prev_choice})
+        return TemplateResponse(request, 'polls/detail.html', {'question': question})
+    return TemplateResponse(request, 'polls/detail.html', {'question': question, 'previous_choice': prev_choice})
 
 
-class ResultsView(generic.DetailView):
+@method_decorator(cache_control(no_cache=True), name='dispatch')
+@method_decorator(condition(etag_func=results_etag), name='dispatch')
+class ResultsView(generic.TemplateView):
     """Poll results page represent the result of each choice for a question."""
 
-    model = Question
     template_name = 'polls/results.html'
 
+    def get_context_data(self, **kwargs):
+        """Add the question, its choices with their votes and the total."""
+        context = super().get_context_data(**kwargs)
+        try:
+            context.update(results_cache.get_results(self.kwargs['pk']))
+        except Question.DoesNotExist:
+            raise Http404('No question found matching the query')
+        context['live_results'] = settings.POLLS_LIVE_RESULTS
+        return context
+
 
 @login_required
 def vote(request, question_id):
@@ -49,17 +165,53 @@ def vote(request, question_id):
     try:
         selected_choice = question.choice_set.get(pk=request.POST['choice'])
     except (KeyError, Choice.DoesNotExist):
-        return render(request, 'polls/detail.html', {
+        return TemplateResponse(request, 'polls/detail.html', {
             'question': question,
             'error_message': "You didn't select a choice."
         })
     else:
-        if question.vote_set.filter(user=request.user).exists():
-            vote = question.vote_set.get(user=request.user)
-            vote.choice = selected_choice
-            vote.save()
+        if settings.POLLS_VOTE_MODE == 'buffered':
+            vote_buffer.get_buffer().add(question.id, request.user.id, selected_choice.id)
         else:
-            selected_choice.vote_set.create(user=request.user, question=question)
+            tallies.cast_vote(question, request.user, selected_choice)
         return HttpResponseRedirect(
             reverse('polls:results', args=(question.id,))
         )
+
+
+def _export_response(rows, columns, file_format, filename):
+    """Stream the rows as a downloadable file."""
+    if file_format not in export.FORMATS:
+        raise Http404('Unknown export format')
+    response = StreamingHttpResponse(
+        export.render(rows, columns, file_format),
+        content_type=export.FORMATS[file_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{file_format}"'
+    return response
+
+
+def _question_ids(request):
+    """Return the question ids given as ?question= parameters."""
+    try:
+        return [int(value) for value in request.GET.getlist('question')]
+    except ValueError:
+        raise Http404('Invalid question id')
+
+
+def export_results(request, file_format):
+    """Download the tally of every choice of the published questions as CSV or NDJSON."""
+    return _export_response(
+        export.result_rows(_question_ids(request), published_by=timezone.now()),
+        export.RESULT_COLUMNS,
+        file_format, 'results'
+    )
+
+
+@staff_member_required
+def export_votes(request, file_format):
+    """Download every vote with its user as CSV or NDJSON."""
+    return _export_response(
+        export.vote_rows(_question_ids(request)), export.VOTE_COLUMNS,
+        file_format, 'votes'
+    )
@@ -0,0 +1,146 @@
+"""Write-behind buffer for votes.
+
+With ``settings.POLLS_VOTE_MODE = 'buffered'`` the vote view only puts
+the vote into this process's buffer and answers at once.  The buffer
+keeps the latest choice of each user on each question and writes them
+all with tallies.cast_votes() when it holds POLLS_VOTE_BUFFER_SIZE
+votes, POLLS_VOTE_BUFFER_INTERVAL seconds after its first vote, or when
+the process exits.
+
+A flush never raises into the request that triggered it.  A vote that
+can never be written, such as one whose user or question was deleted
+after it was buffered, is dropped alone; when the database cannot be
+reached the batch goes back into the buffer for the next flush.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections
+
+from . import tallies
+
+logger = logging.getLogger(__name__)
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+class VoteBuffer:
+    """Collect votes in memory and flush them to the database in batches."""
+
+    # A concurrent synchronous vote may insert a row the batch expected
+    # to create; the batch is then retried and sees that row.
+    flush_attempts = 3
+
+    def __init__(self, size, interval):
+        """Create an empty buffer.
+
+        Args:
+            size: number of pending votes that triggers a flush
+            interval: seconds after the first pending vote before a flush
+        """
+        self.size = size
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        # Batches are written one at a time so a later vote of a user
+        # can never be overwritten by an earlier batch.
+        self._write_lock = threading.Lock()
+        self._timer = None
+
+    def __len__(self):
+        """Return the number of pending votes."""
+        return len(self._pending)
+
+    def add(self, question_id, user_id, choice_id):
+        """Put a vote into the buffer, replacing the user's pending vote."""
+        with self._lock:
+            self._pending[(question_id, user_id)] = choice_id
+            if len(self._pending) < self.size:
+                self._start_timer()
+                return
+            batch = self._take()
+        self._write(batch)
+
+    def flush(self):
+        """Write all pending votes to the database.
+
+        Returns:
+            int: the number of votes that changed a tally
+        """
+        with self._lock:
+            batch = self._take()
+        return self._write(batch)
+
+    def _start_timer(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.interval, self._flush_in_thread)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _take(self):
+        batch, self._pending = self._pending, {}
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _put_back(self, batch):
+        # Votes added since the batch was taken are newer and win.
+        with self._lock:
+            for key, choice_id in batch.items():
+                self._pending.setdefault(key, choice_id)
+            if self._pending:
+                self._start_timer()
+
+    def _write(self, batch):
+        with self._write_lock:
+            try:
+                return self._write_batch(batch)
+            except DatabaseError:
+                # cast_votes() skips votes that are already stored, so
+                # writing the whole batch again later is safe.
+                logger.exception('Writing %d buffered votes failed, keeping them', len(batch))
+                self._put_back(batch)
+                return 0
+
+    def _write_batch(self, batch):
+        for attempt in range(self.flush_attempts):
+            try:
+                return tallies.cast_votes(batch)
+            except IntegrityError:
+                logger.warning('Retrying a batch of %d buffered votes', len(batch))
+        # The batch holds a vote that can never be written: write the
+        # votes one at a time and drop only the ones that fail.
+        written = 0
+        for (question_id, user_id), choice_id in batch.items():
+            try:
+                written += tallies.cast_votes({(question_id, user_id): choice_id})
+            except IntegrityError:
+                logger.error(
+                    'Dropping the buffered vote of user %s on question %s', user_id, question_id
+                )
+        return written
+
+    def _flush_in_thread(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Flushing the vote buffer failed')
+        finally:
+            connections.close_all()
+
+
+def get_buffer():
+    """Return the vote buffer of this process, creating it on first use."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = VoteBuffer(
+                settings.POLLS_VOTE_BUFFER_SIZE,
+                settings.POLLS_VOTE_BUFFER_INTERVAL
+            )
+            atexit.register(_buffer.flush)
+    return _buffer